@@ -0,0 +1,367 @@
+"""Benchmarks for the NestedMKDict and FlatMKDict hot paths.
+
+Run from the repository root:
+
+    python benchmarks/run.py --sizes 100,10000 --output results.json
+    python benchmarks/run.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --baseline benchmarks/baseline.json --threshold 0.2
+
+Each case is run on synthetic trees of the requested number of leaves and of
+several depths. The results are written as JSON, comparison with a baseline
+reports the cases, which are slower by more than the threshold, and sets
+the exit code to 1.
+"""
+
+from __future__ import annotations
+
+import json
+import platform
+import sys
+from argparse import ArgumentParser
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+from typing import TYPE_CHECKING
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from multikeydict.flatmkdict import FlatMKDict  # noqa: E402
+from multikeydict.nestedmkdict import NestedMKDict  # noqa: E402
+from multikeydict.tools.diff import diff  # noqa: E402
+from multikeydict.tools.map import mkmap, remap_items  # noqa: E402
+from multikeydict.tools.match import match_keys  # noqa: E402
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+DEPTHS = (2, 4, 6)
+DEFAULT_SIZES = (100, 10_000)
+
+_cases: dict[str, Callable[[int, int], Callable[[], object]]] = {}
+
+
+def case(name: str):
+    """Register a benchmark: a function (leaves, depth) -> callable to time"""
+
+    def decorator(fcn):
+        _cases[name] = fcn
+        return fcn
+
+    return decorator
+
+
+@dataclass
+class Result:
+    name: str
+    leaves: int
+    depth: int
+    seconds: float
+    seconds_median: float
+    repeat: int
+    number: int
+
+    @property
+    def id(self) -> str:
+        return f"{self.name}[{self.leaves},{self.depth}]"
+
+
+def make_keys(leaves: int, depth: int) -> list[tuple[str, ...]]:
+    """The keys of a balanced tree with at least `leaves` leaves, truncated to `leaves`"""
+    width = 2
+    while width**depth < leaves:
+        width += 1
+
+    keys = []
+    for i in range(leaves):
+        key = []
+        for level in range(depth):
+            i, rest = divmod(i, width)
+            key.append(f"l{level}k{rest}")
+        keys.append(tuple(reversed(key)))
+    return keys
+
+
+def make_tree(leaves: int, depth: int) -> NestedMKDict:
+    return NestedMKDict.from_flatdict(
+        ((key, float(i)) for i, key in enumerate(make_keys(leaves, depth))), sep="."
+    )
+
+
+@case("get_any")
+def _(leaves, depth):
+    tree = make_tree(leaves, depth)
+    keys = make_keys(leaves, depth)
+    get_any = tree.get_any
+    return lambda: [get_any(key) for key in keys]
+
+
+@case("get_any_str")
+def _(leaves, depth):
+    tree = make_tree(leaves, depth)
+    keys = [".".join(key) for key in make_keys(leaves, depth)]
+    get_any = tree.get_any
+    return lambda: [get_any(key) for key in keys]
+
+
+@case("set")
+def _(leaves, depth):
+    keys = make_keys(leaves, depth)
+
+    def run():
+        tree = NestedMKDict({})
+        for key in keys:
+            tree[key] = 1.0
+
+    return run
+
+
+@case("walkitems")
+def _(leaves, depth):
+    tree = make_tree(leaves, depth)
+    return lambda: list(tree.walkitems())
+
+
+@case("flatten")
+def _(leaves, depth):
+    tree = make_tree(leaves, depth)
+    return tree.flatten
+
+
+@case("deepcopy")
+def _(leaves, depth):
+    tree = make_tree(leaves, depth)
+    return tree.deepcopy
+
+
+@case("update")
+def _(leaves, depth):
+    source = make_tree(leaves, depth)
+    return lambda: NestedMKDict({}).update(source)
+
+
+@case("update_override")
+def _(leaves, depth):
+    base = make_tree(leaves, depth)
+    keys = make_keys(leaves, depth)
+    override = NestedMKDict.from_flatdict(
+        (key, -1.0) for key in keys[:: max(1, leaves // 100)]
+    )
+    return lambda: base.snapshot().update(override)
+
+
+@case("diff_snapshot")
+def _(leaves, depth):
+    base = make_tree(leaves, depth)
+    other = base.snapshot()
+    other[make_keys(leaves, depth)[leaves // 2]] = -1.0
+    return lambda: diff(base, other)
+
+
+@case("digest_modified")
+def _(leaves, depth):
+    tree = make_tree(leaves, depth)
+    key = make_keys(leaves, depth)[leaves // 2]
+    tree.digest()
+
+    def run():
+        tree[key] = -tree[key]
+        return tree.digest()
+
+    return run
+
+
+@case("from_flatdict")
+def _(leaves, depth):
+    items = [(key, 1.0) for key in make_keys(leaves, depth)]
+    return lambda: NestedMKDict.from_flatdict(items)
+
+
+@case("flat_getitem")
+def _(leaves, depth):
+    keys = make_keys(leaves, depth)
+    flat = FlatMKDict((key, 1.0) for key in keys)
+    reversed_keys = [tuple(reversed(key)) for key in keys]
+    return lambda: [flat[key] for key in reversed_keys]
+
+
+@case("flat_from_items")
+def _(leaves, depth):
+    items = [(tuple(sorted(key)), 1.0) for key in make_keys(leaves, depth)]
+    return lambda: FlatMKDict.from_items(items, assume_canonical=True)
+
+
+@case("flat_items_args")
+def _(leaves, depth):
+    keys = make_keys(leaves, depth)
+    flat = FlatMKDict((key, 1.0) for key in keys)
+    args = keys[0][:2]
+    return lambda: list(flat.items(*args))
+
+
+@case("flat_slice")
+def _(leaves, depth):
+    keys = make_keys(leaves, depth)
+    flat = FlatMKDict((key, 1.0) for key in keys)
+    args = keys[0][:1]
+    return lambda: flat.slice(*args)
+
+
+@case("match_keys")
+def _(leaves, depth):
+    keys = make_keys(leaves, depth)
+    # Match each full key against the keys of the first level
+    keys_left = sorted({key[:1] for key in keys})
+
+    def run():
+        matched = []
+        match_keys(
+            (keys_left,),
+            keys,
+            lambda i, left, right: matched.append(right),
+            require_all_left_keys_processed=False,
+        )
+        return matched
+
+    return run
+
+
+@case("remap_items")
+def _(leaves, depth):
+    tree = make_tree(leaves, depth)
+    first = next(tree.walkkeys())[0]
+    rename_indices = {first: (first, f"{first}copy")}
+    reorder_indices = list(reversed(range(depth)))
+    return lambda: remap_items(
+        tree, rename_indices=rename_indices, reorder_indices=reorder_indices
+    )
+
+
+@case("mkmap")
+def _(leaves, depth):
+    tree1 = make_tree(leaves, depth)
+    tree2 = make_tree(leaves, depth)
+    return lambda: mkmap(lambda a, b: a + b, tree1, tree2)
+
+
+def measure(fcn: Callable[[], object], repeat: int, mintime: float) -> tuple[float, float, int]:
+    """Return the best and the median time of a single call and the number of calls per run"""
+    number = 1
+    while True:
+        start = perf_counter()
+        for _ in range(number):
+            fcn()
+        elapsed = perf_counter() - start
+        if elapsed >= mintime:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(mintime / elapsed) + 1))
+
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = perf_counter()
+        for _ in range(number):
+            fcn()
+        times.append((perf_counter() - start) / number)
+    return min(times), median(times), number
+
+
+def run(
+    sizes: tuple[int, ...],
+    depths: tuple[int, ...],
+    names: list[str],
+    repeat: int,
+    mintime: float,
+) -> list[Result]:
+    results = []
+    for name in names:
+        for leaves in sizes:
+            for depth in depths:
+                fcn = _cases[name](leaves, depth)
+                best, med, number = measure(fcn, repeat, mintime)
+                result = Result(name, leaves, depth, best, med, repeat, number)
+                results.append(result)
+                print(
+                    f"{result.id:<32} {best * 1e3:12.4f} ms"
+                    f" {best / leaves * 1e9:10.1f} ns/leaf",
+                    file=sys.stderr,
+                )
+    return results
+
+
+def compare(results: list[Result], baseline: dict, threshold: float) -> list[str]:
+    """Return the descriptions of the regressions against the baseline"""
+    reference = {
+        Result(**{**entry, "repeat": 0, "number": 0}).id: entry["seconds"]
+        for entry in baseline["results"]
+    }
+    regressions = []
+    for result in results:
+        seconds = reference.get(result.id)
+        if seconds is None or seconds <= 0:
+            continue
+        ratio = result.seconds / seconds
+        if ratio > 1.0 + threshold:
+            regressions.append(
+                f"{result.id}: {seconds * 1e3:.4f} ms → {result.seconds * 1e3:.4f} ms (×{ratio:.2f})"
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = ArgumentParser(description=__doc__.split("\n", 1)[0])
+    parser.add_argument(
+        "--sizes",
+        default=",".join(map(str, DEFAULT_SIZES)),
+        help="comma separated numbers of leaves, up to 1000000",
+    )
+    parser.add_argument("--depths", default=",".join(map(str, DEPTHS)))
+    parser.add_argument("-k", "--filter", default="", help="run the cases containing the substring")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--mintime", type=float, default=0.05, help="minimal time of a single run, s")
+    parser.add_argument("-o", "--output", type=Path, help="write the results to JSON")
+    parser.add_argument("--save-baseline", type=Path, help="write the results as a baseline")
+    parser.add_argument("--baseline", type=Path, help="compare the results with the baseline")
+    parser.add_argument(
+        "--threshold", type=float, default=0.2, help="relative slowdown to report as a regression"
+    )
+    parser.add_argument("--list", action="store_true", help="list the cases and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(_cases))
+        return 0
+
+    names = [name for name in _cases if args.filter in name]
+    sizes = tuple(int(s) for s in args.sizes.split(","))
+    depths = tuple(int(d) for d in args.depths.split(","))
+    results = run(sizes, depths, names, args.repeat, args.mintime)
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "results": [asdict(result) for result in results],
+    }
+    for path in (args.output, args.save_baseline):
+        if path is not None:
+            path.write_text(json.dumps(report, indent=2))
+
+    if args.baseline is None:
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        return 1
+    print(f"No regressions over {args.threshold:.0%}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,2 +1,12 @@
 from .nestedmkdict import NestedMKDict, NestedMKDictAccess
 from .flatmkdict import FlatMKDict
+from .frozenmkdict import FrozenNestedMKDict
+
+
+def __getattr__(name):
+    # ColumnarMKDict requires numpy, which is imported on the first use
+    if name == "ColumnarMKDict":
+        from .columnarmkdict import ColumnarMKDict
+
+        return ColumnarMKDict
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
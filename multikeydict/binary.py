@@ -0,0 +1,466 @@
+"""Binary format of a nested dictionary.
+
+The file is a sequence of the length-prefixed blocks (u64 length + payload),
+written in post-order: the nested dictionaries and the non-scalar leaves are
+written before the dictionary, which contains them. A dictionary block contains
+the number of items and the items: the key, the value tag and an 8 byte field,
+which is either the value itself (None, bool, int, float) or the offset of the
+value block. The numpy arrays are written raw, aligned to ALIGNMENT bytes. The
+trailer contains the offsets of the root dictionary and of the metadata.
+
+    MAGIC | blocks... | root offset (u64) | meta offset (u64) | TRAILER_MAGIC
+
+The dictionaries are decoded lazily: LazyDict decodes the keys of its block
+and decodes a value on the first access.
+"""
+
+from __future__ import annotations
+
+import json
+import pickle
+import sys
+from collections.abc import ItemsView, Mapping, ValuesView
+from mmap import ACCESS_READ, mmap
+from struct import Struct
+from typing import TYPE_CHECKING
+
+from .nestedmkdict import NestedMKDict
+
+if TYPE_CHECKING:
+    from os import PathLike
+    from typing import Any, BinaryIO
+
+MAGIC = b"MKDICT\x00\x01"
+TRAILER_MAGIC = b"MKDTAIL1"
+ALIGNMENT = 64
+
+_T_DICT = 0
+_T_NONE = 1
+_T_FALSE = 2
+_T_TRUE = 3
+_T_INT = 4
+_T_FLOAT = 5
+_T_STR = 6
+_T_BYTES = 7
+_T_ARRAY = 8
+_T_PICKLE = 9
+_T_BIGINT = 10
+
+_U8 = Struct("<B")
+_U32 = Struct("<I")
+_U64 = Struct("<Q")
+_I64 = Struct("<q")
+_F64 = Struct("<d")
+_TRAILER = Struct("<QQ8s")
+_ZERO = bytes(8)
+_INT_MIN = -(2**63)
+_INT_MAX = 2**63 - 1
+_INLINE_TAGS = frozenset((_T_NONE, _T_FALSE, _T_TRUE, _T_INT, _T_FLOAT))
+_MISSING = object()
+
+
+class _Pending:
+    """The value, which is not yet decoded: the tag and the offset of its block"""
+
+    __slots__ = ("tag", "offset")
+
+    def __init__(self, tag: int, offset: int):
+        self.tag = tag
+        self.offset = offset
+
+
+class LazyDict(dict):
+    """dict, which values are decoded from the buffer on the first access.
+
+    The decoded value replaces the placeholder, so each value is decoded once.
+    Without the buffer it is a plain dict.
+    """
+
+    __slots__ = ("_buffer",)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._buffer = None
+
+    def _decode(self, key: Any, value: Any) -> Any:
+        if value.__class__ is _Pending:
+            value = _decode_block(self._buffer, value.tag, value.offset, True)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def __getitem__(self, key):
+        return self._decode(key, dict.__getitem__(self, key))
+
+    def get(self, key, default=None):
+        value = dict.get(self, key, _MISSING)
+        if value is _MISSING:
+            return default
+        return self._decode(key, value)
+
+    def __iter__(self):
+        # Defined in order to make dict.update() and dict() use __getitem__
+        return dict.__iter__(self)
+
+    def items(self) -> ItemsView:
+        return ItemsView(self)
+
+    def values(self) -> ValuesView:
+        return ValuesView(self)
+
+    def pop(self, key, *args):
+        value = dict.pop(self, key, *args)
+        if value.__class__ is _Pending:
+            value = _decode_block(self._buffer, value.tag, value.offset, True)
+        return value
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        if value.__class__ is _Pending:
+            value = _decode_block(self._buffer, value.tag, value.offset, True)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        value = dict.setdefault(self, key, default)
+        return self._decode(key, value)
+
+    def copy(self) -> LazyDict:
+        """Shallow copy with the values decoded: the copy does not refer to the buffer"""
+        return LazyDict(self.items())
+
+    def __or__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        ret = dict(self.items())
+        ret.update(other)
+        return ret
+
+    def __eq__(self, other):
+        if not isinstance(other, Mapping):
+            return NotImplemented
+        return dict(self.items()) == other
+
+    def __ne__(self, other):
+        ret = self.__eq__(other)
+        return ret if ret is NotImplemented else not ret
+
+    __hash__ = None  # pyright: ignore [reportAssignmentType]
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __reduce__(self):
+        return dict, (dict(self.items()),)
+
+
+class _Writer:
+    __slots__ = ("_file", "_pos")
+
+    def __init__(self, fileobj: BinaryIO):
+        self._file = fileobj
+        self._pos = 0
+
+    def write(self, data) -> None:
+        self._file.write(data)
+        self._pos += len(data)
+
+    def block(self, payload: bytes | bytearray) -> int:
+        """Write the length-prefixed block, return its offset"""
+        offset = self._pos
+        self.write(_U64.pack(len(payload)))
+        self.write(payload)
+        return offset
+
+    def array(self, array) -> int:
+        """Write the array block with the data aligned to ALIGNMENT, return its offset"""
+        header, data = _encode_array(array, self._pos + _U64.size, ALIGNMENT)
+        offset = self._pos
+        self.write(_U64.pack(len(header) + len(data)))
+        self.write(header)
+        if data:
+            self.write(data)
+        return offset
+
+    def value(self, value: Any) -> tuple[int, bytes]:
+        """Write the leaf block if needed, return the tag and the 8 byte field"""
+        tag = _leaf_tag(value)
+        if tag in _INLINE_TAGS:
+            return tag, _encode_leaf(tag, value)
+        if tag == _T_ARRAY:
+            return tag, _U64.pack(self.array(value))
+        return tag, _U64.pack(self.block(_encode_leaf(tag, value)))
+
+    def tree(self, dic: Mapping) -> int:
+        """Write the nested dictionary in post-order, return the offset of the root"""
+        if isinstance(dic, NestedMKDict):
+            dic = dic._object
+        stack = [(iter(dic.items()), bytearray(_U64.pack(len(dic))), None)]
+        while stack:
+            iterator, payload, _ = stack[-1]
+            for key, value in iterator:
+                if isinstance(value, NestedMKDict):
+                    value = value._object
+                if isinstance(value, dict):
+                    stack.append(
+                        (iter(value.items()), bytearray(_U64.pack(len(value))), key)
+                    )
+                    break
+                tag, field = self.value(value)
+                _encode_item(payload, key, tag, field)
+            else:
+                _, payload, key = stack.pop()
+                offset = self.block(payload)
+                if not stack:
+                    return offset
+                _encode_item(stack[-1][1], key, _T_DICT, _U64.pack(offset))
+        raise RuntimeError("unreachable")
+
+
+def _leaf_tag(value: Any) -> int:
+    if value is None:
+        return _T_NONE
+    if value is False:
+        return _T_FALSE
+    if value is True:
+        return _T_TRUE
+    cls = value.__class__
+    if cls is float:
+        return _T_FLOAT
+    if cls is int:
+        return _T_INT if _INT_MIN <= value <= _INT_MAX else _T_BIGINT
+    if cls is str:
+        return _T_STR
+    if cls is bytes:
+        return _T_BYTES
+    if _is_raw_array(value):
+        return _T_ARRAY
+    return _T_PICKLE
+
+
+def _encode_leaf(tag: int, value: Any) -> bytes | memoryview:
+    """The payload of the leaf: 8 bytes for the inline tags"""
+    if tag == _T_FLOAT:
+        return _F64.pack(value)
+    if tag == _T_INT:
+        return _I64.pack(value)
+    if tag in _INLINE_TAGS:
+        return _ZERO
+    if tag == _T_STR:
+        return value.encode()
+    if tag == _T_BYTES:
+        return value
+    if tag == _T_BIGINT:
+        return str(value).encode()
+    if tag == _T_ARRAY:
+        header, data = _encode_array(value, 0, 1)
+        return bytes(header) + data
+    return pickle.dumps(value, protocol=5)
+
+
+def _decode_leaf(tag: int, data: memoryview) -> Any:
+    if tag == _T_FLOAT:
+        return _F64.unpack_from(data)[0]
+    if tag == _T_INT:
+        return _I64.unpack_from(data)[0]
+    if tag == _T_NONE:
+        return None
+    if tag == _T_FALSE:
+        return False
+    if tag == _T_TRUE:
+        return True
+    if tag == _T_STR:
+        return str(data, "utf-8")
+    if tag == _T_BYTES:
+        return bytes(data)
+    if tag == _T_ARRAY:
+        return _decode_array(data)
+    if tag == _T_BIGINT:
+        return int(str(data, "ascii"))
+    if tag == _T_PICKLE:
+        return pickle.loads(data)
+    raise ValueError(f"Invalid tag {tag}")
+
+
+def _encode_array(array, payload_pos: int, alignment: int) -> tuple[bytearray, bytes | memoryview]:
+    """The header and the data of the array, the data is aligned, given the
+    header starts at payload_pos"""
+    if not array.flags.c_contiguous:
+        array = array.copy(order="C")
+    dtype = array.dtype.str.encode()
+    header = bytearray(_U8.pack(len(dtype)))
+    header += dtype
+    header += _U8.pack(array.ndim)
+    for n in array.shape:
+        header += _U64.pack(n)
+    # u32 offset of the data relative to the payload
+    header_size = len(header) + _U32.size
+    data_rel = -(payload_pos + header_size) % alignment + header_size
+    header += _U32.pack(data_rel)
+    header += bytes(data_rel - len(header))
+    return header, array.data.cast("B") if array.nbytes else b""
+
+
+def _is_raw_array(value: Any) -> bool:
+    ndarray = _ndarray()
+    if ndarray is None or value.__class__ is not ndarray:
+        return False
+    dtype = value.dtype
+    return not dtype.hasobject and dtype.fields is None and dtype.subdtype is None
+
+
+def _ndarray():
+    """numpy.ndarray, if numpy is imported: otherwise there may be no arrays"""
+    numpy = sys.modules.get("numpy")
+    return None if numpy is None else numpy.ndarray
+
+
+def _encode_item(payload: bytearray, key: Any, tag: int, field: bytes) -> None:
+    if key.__class__ is str:
+        data = key.encode()
+        payload += _U8.pack(_T_STR)
+        payload += _U32.pack(len(data))
+        payload += data
+    elif key.__class__ is int and _INT_MIN <= key <= _INT_MAX:
+        payload += _U8.pack(_T_INT)
+        payload += _I64.pack(key)
+    else:
+        data = pickle.dumps(key, protocol=5)
+        payload += _U8.pack(_T_PICKLE)
+        payload += _U32.pack(len(data))
+        payload += data
+    payload += _U8.pack(tag)
+    payload += field
+
+
+def _decode_dict(buffer: memoryview, offset: int, lazy: bool) -> dict:
+    (length,) = _U64.unpack_from(buffer, offset)
+    pos = offset + _U64.size
+    (count,) = _U64.unpack_from(buffer, pos)
+    pos += _U64.size
+
+    items = []
+    for _ in range(count):
+        keytag = buffer[pos]
+        pos += 1
+        if keytag == _T_INT:
+            (key,) = _I64.unpack_from(buffer, pos)
+            pos += _I64.size
+        else:
+            (size,) = _U32.unpack_from(buffer, pos)
+            pos += _U32.size
+            data = buffer[pos : pos + size]
+            pos += size
+            key = str(data, "utf-8") if keytag == _T_STR else pickle.loads(data)
+
+        tag = buffer[pos]
+        pos += 1
+        if tag == _T_FLOAT:
+            (value,) = _F64.unpack_from(buffer, pos)
+        elif tag == _T_INT:
+            (value,) = _I64.unpack_from(buffer, pos)
+        elif tag == _T_NONE:
+            value = None
+        elif tag == _T_FALSE:
+            value = False
+        elif tag == _T_TRUE:
+            value = True
+        else:
+            (block,) = _U64.unpack_from(buffer, pos)
+            if lazy:
+                value = _Pending(tag, block)
+            else:
+                value = _decode_block(buffer, tag, block, False)
+        pos += _U64.size
+        items.append((key, value))
+
+    if pos != offset + _U64.size + length:
+        raise ValueError(f"Corrupted dictionary block at {offset}")
+
+    if not lazy:
+        return dict(items)
+    ret = LazyDict(items)
+    ret._buffer = buffer
+    return ret
+
+
+def _decode_block(buffer: memoryview, tag: int, offset: int, lazy: bool) -> Any:
+    if tag == _T_DICT:
+        return _decode_dict(buffer, offset, lazy)
+
+    (length,) = _U64.unpack_from(buffer, offset)
+    start = offset + _U64.size
+    return _decode_leaf(tag, buffer[start : start + length])
+
+
+def _decode_array(data: memoryview):
+    """The array, sharing the memory with the buffer (read-only for a read-only buffer)"""
+    from numpy import dtype as npdtype
+    from numpy import frombuffer
+
+    size = data[0]
+    dtype = npdtype(str(data[1 : 1 + size], "ascii"))
+    pos = 1 + size
+    ndim = data[pos]
+    pos += 1
+    shape = tuple(_U64.unpack_from(data, pos + _U64.size * i)[0] for i in range(ndim))
+    pos += _U64.size * ndim
+    (data_rel,) = _U32.unpack_from(data, pos)
+
+    count = 1
+    for n in shape:
+        count *= n
+    return frombuffer(data, dtype=dtype, count=count, offset=data_rel).reshape(shape)
+
+
+def write_tree(fileobj: BinaryIO, tree: NestedMKDict | Mapping, *, sep: str | None = None) -> None:
+    """Write the nested dictionary to the binary file object sequentially (no
+    seek is needed)"""
+    if sep is None and isinstance(tree, NestedMKDict):
+        sep = tree._sep
+    writer = _Writer(fileobj)
+    writer.write(MAGIC)
+    root = writer.tree(tree)
+    meta = writer.block(json.dumps({"sep": sep}).encode())
+    writer.write(_TRAILER.pack(root, meta, TRAILER_MAGIC))
+
+
+def read_tree(buffer, *, lazy: bool = True) -> tuple[dict, dict[str, Any]]:
+    """Decode the root dictionary and the metadata from the buffer (bytes, mmap)"""
+    buffer = memoryview(buffer)
+    if bytes(buffer[: len(MAGIC)]) != MAGIC or len(buffer) < len(MAGIC) + _TRAILER.size:
+        raise ValueError("Not a nested dictionary binary data")
+    root, meta, magic = _TRAILER.unpack_from(buffer, len(buffer) - _TRAILER.size)
+    if magic != TRAILER_MAGIC:
+        raise ValueError("Truncated nested dictionary binary data")
+    meta = json.loads(str(_decode_block(buffer, _T_BYTES, meta, False), "utf-8"))
+    return _decode_dict(buffer, root, lazy), meta
+
+
+def make_nestedmkdict(
+    root: dict, meta: dict[str, Any], *, cls: type[NestedMKDict] = NestedMKDict, **kwargs
+) -> NestedMKDict:
+    """Wrap the decoded root with `cls`. The nested plain dictionaries, added
+    later, are treated as nested, as LazyDict is a dict."""
+    kwargs.setdefault("sep", meta.get("sep"))
+    ret = cls(root, **kwargs)
+    ret._types = dict
+    return ret
+
+
+def dump_mmap(tree: NestedMKDict | Mapping, path: str | PathLike) -> None:
+    """Write the nested dictionary to the file to be opened with load_mmap()"""
+    with open(path, "wb") as fileobj:
+        write_tree(fileobj, tree)
+
+
+def load_mmap(path: str | PathLike, **kwargs) -> NestedMKDict:
+    """Open the nested dictionary file, written by dump_mmap(), via mmap.
+
+    Only the keys of the root dictionary are decoded. The nested dictionaries
+    and the values are decoded on the first access, the pages of the file are
+    read by the OS on demand. The numpy arrays are read-only views of the file.
+    """
+    with open(path, "rb") as fileobj:
+        buffer = mmap(fileobj.fileno(), 0, access=ACCESS_READ)
+    root, meta = read_tree(buffer, lazy=True)
+    return make_nestedmkdict(root, meta, **kwargs)
+
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from typing import TYPE_CHECKING
+
+from numpy import asarray, issubdtype, number
+from numpy.lib.mixins import NDArrayOperatorsMixin
+
+from .nestedmkdict import NestedMKDict
+
+if TYPE_CHECKING:
+    from collections.abc import Generator
+    from typing import Any, Self
+
+    from numpy import ndarray
+    from numpy.typing import DTypeLike
+
+
+class ColumnarMKDict(NDArrayOperatorsMixin):
+    """Numeric leaves of a nested dictionary in a single contiguous numpy array.
+
+    The layout (the leaf keys in the order of walkitems() and the key→offset
+    index) is fixed at construction and shared by the instances, made by the
+    arithmetic operations. The leaves of a nested key occupy a contiguous range,
+    so a nested dictionary is a view of the array.
+
+    The arithmetic operators and numpy ufuncs are applied to the whole array:
+    `tree * 2`, `tree_a + tree_b`, `numpy.exp(tree)`. The operands with the same
+    leaves in a different order are aligned by key.
+    """
+
+    __slots__ = ("_keys", "_offsets", "_values", "_ranges", "_sep")
+    _keys: tuple[tuple, ...]
+    _offsets: dict[tuple, int]
+    _values: ndarray
+    # nested key -> (start, stop) range of its leaves, built on the first request
+    _ranges: dict[tuple, tuple[int, int]] | None
+    _sep: str | None
+
+    def __init__(
+        self,
+        dic: NestedMKDict | Mapping,
+        *,
+        dtype: DTypeLike = None,
+        sep: str | None = None,
+    ):
+        if not isinstance(dic, NestedMKDict):
+            dic = NestedMKDict(dic, sep=sep)
+        if sep is None:
+            sep = dic._sep
+
+        keys = []
+        values = []
+        # depth-first tree order: the leaves of each nested key are contiguous
+        for key, value in dic.walkitems():
+            keys.append(key)
+            values.append(value)
+
+        array = asarray(values, dtype=dtype)
+        if array.ndim != 1 or (
+            len(values) and not issubdtype(array.dtype, number) and array.dtype != bool
+        ):
+            raise TypeError(
+                f"ColumnarMKDict: leaves should be numeric scalars, got {array.dtype}"
+                f" of shape {array.shape}"
+            )
+
+        self._keys = tuple(keys)
+        self._offsets = {key: i for i, key in enumerate(self._keys)}
+        self._values = array
+        self._ranges = None
+        self._sep = sep
+
+    @classmethod
+    def from_nested(
+        cls, dic: NestedMKDict | Mapping, *, dtype: DTypeLike = None
+    ) -> Self:
+        return cls(dic, dtype=dtype)
+
+    def _make(self, values: ndarray, keys: tuple | None = None) -> Self:
+        """Instance with the same layout (or keys) and new values"""
+        ret = type(self).__new__(type(self))
+        if keys is None:
+            ret._keys = self._keys
+            ret._offsets = self._offsets
+            ret._ranges = self._ranges
+        else:
+            ret._keys = keys
+            ret._offsets = {key: i for i, key in enumerate(keys)}
+            ret._ranges = None
+        ret._values = values
+        ret._sep = self._sep
+        return ret
+
+    @property
+    def values(self) -> ndarray:
+        """The array of the leaves"""
+        return self._values
+
+    @property
+    def sep(self) -> str | None:
+        return self._sep
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __array__(self, dtype=None, copy=None):
+        if copy:
+            return self._values.astype(dtype, copy=True)
+        if dtype is None:
+            return self._values
+        return self._values.astype(dtype, copy=False)
+
+    def __str__(self):
+        return f"ColumnarMKDict({len(self)} leaves, {self._values.dtype})"
+
+    __repr__ = __str__
+
+    def keypath(self, key) -> tuple:
+        return NestedMKDict.keypath(self, key)
+
+    def _range(self, path: tuple) -> tuple[int, int] | None:
+        ranges = self._ranges
+        if ranges is None:
+            ranges = {}
+            for i, key in enumerate(self._keys):
+                for depth in range(1, len(key)):
+                    prefix = key[:depth]
+                    bounds = ranges.get(prefix)
+                    if bounds is None:
+                        ranges[prefix] = (i, i + 1)
+                    elif bounds[1] == i:
+                        ranges[prefix] = (bounds[0], i + 1)
+                    else:
+                        raise RuntimeError(
+                            f"ColumnarMKDict: the leaves of {prefix} are not contiguous"
+                        )
+            self._ranges = ranges
+        return ranges.get(path)
+
+    def get_any(self, key) -> Any:
+        """A leaf value, or a view of the nested dictionary"""
+        path = self.keypath(key)
+        if not path:
+            return self
+        offset = self._offsets.get(path)
+        if offset is not None:
+            return self._values[offset]
+        bounds = self._range(path)
+        if bounds is None:
+            raise KeyError(f"No nested key '{key}'")
+        start, stop = bounds
+        depth = len(path)
+        return self._make(
+            self._values[start:stop],
+            tuple(key[depth:] for key in self._keys[start:stop]),
+        )
+
+    __getitem__ = get_any
+
+    def get(self, key, default=None) -> Any:
+        try:
+            return self.get_any(key)
+        except KeyError:
+            return default
+
+    def __contains__(self, key) -> bool:
+        path = self.keypath(key)
+        return path in self._offsets or self._range(path) is not None
+
+    def __setitem__(self, key, value) -> None:
+        """Set the value of a leaf, or of all the leaves of a nested key.
+        The layout is fixed: new keys may not be added."""
+        path = self.keypath(key)
+        offset = self._offsets.get(path)
+        if offset is not None:
+            self._values[offset] = value
+            return
+        bounds = self._range(path) if path else (0, len(self._keys))
+        if bounds is None:
+            raise KeyError(f"ColumnarMKDict: unable to add the new key '{key}'")
+        start, stop = bounds
+        if isinstance(value, ColumnarMKDict):
+            value = value._values
+        self._values[start:stop] = value
+
+    def walkitems(self) -> Generator[tuple[tuple, Any], None, None]:
+        yield from zip(self._keys, self._values.tolist())
+
+    def walkkeys(self) -> Generator[tuple, None, None]:
+        yield from self._keys
+
+    def walkvalues(self) -> ndarray:
+        """The array of the leaves (a view)"""
+        return self._values
+
+    def walkjoineditems(self, sep: str | None = None):
+        if sep is None:
+            sep = self._sep
+        if sep is None:
+            sep = "."
+        for k, v in self.walkitems():
+            yield sep.join(k), v
+
+    def flatten(self, sep: str | None = None) -> dict[str, Any]:
+        return dict(self.walkjoineditems(sep=sep))
+
+    def to_nested(self, **kwargs) -> NestedMKDict:
+        """NestedMKDict with the leaves as python scalars"""
+        kwargs.setdefault("sep", self._sep)
+        return NestedMKDict.from_flatdict(self.walkitems(), **kwargs)
+
+    def copy(self) -> Self:
+        return self._make(self._values.copy())
+
+    def _aligned(self, other: ColumnarMKDict) -> ndarray:
+        """The values of other in the order of the keys of self"""
+        if other._keys is self._keys or other._keys == self._keys:
+            return other._values
+        if len(other._keys) != len(self._keys) or other._offsets.keys() != self._offsets.keys():
+            raise ValueError("ColumnarMKDict: the operands have different keys")
+        offsets = other._offsets
+        return other._values[[offsets[key] for key in self._keys]]
+
+    def __array_ufunc__(self, ufunc, method, *inputs, out=None, **kwargs):
+        args = tuple(
+            self._aligned(x) if isinstance(x, ColumnarMKDict) else x for x in inputs
+        )
+        if out is not None:
+            for o in out:
+                if isinstance(o, ColumnarMKDict) and not (
+                    o._keys is self._keys or o._keys == self._keys
+                ):
+                    raise ValueError("ColumnarMKDict: the output has different keys order")
+            kwargs["out"] = tuple(
+                o._values if isinstance(o, ColumnarMKDict) else o for o in out
+            )
+
+        result = getattr(ufunc, method)(*args, **kwargs)
+        if method != "__call__":
+            return result
+        if out is not None:
+            return out[0] if len(out) == 1 else out
+        if isinstance(result, tuple):
+            return tuple(self._wrap_result(r) for r in result)
+        return self._wrap_result(result)
+
+    def _wrap_result(self, result: Any) -> Any:
+        if getattr(result, "shape", None) != self._values.shape:
+            # broadcasted to a larger shape
+            return result
+        return self._make(result)
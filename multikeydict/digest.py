@@ -0,0 +1,112 @@
+"""Stable content digests of nested dictionaries.
+
+The digest of a dictionary is the blake2b hash of the sorted (key, value
+digest) pairs, so it does not depend on the order of the items. The leaves are
+hashed by their binary encoding (see multikeydict.binary): the numpy arrays by
+dtype, shape and buffer. The containers (tuple, list, set, mapping) are hashed
+item by item, the other objects are pickled.
+
+The digests of the nested dictionaries are kept in a trie of DigestNode,
+which follows the tree, see NestedMKDict.digest().
+"""
+
+from __future__ import annotations
+
+from collections.abc import Mapping
+from hashlib import blake2b
+from struct import Struct
+from typing import TYPE_CHECKING
+
+from .binary import _encode_leaf, _leaf_tag
+from .nestedmkdict import NestedMKDict
+
+if TYPE_CHECKING:
+    from typing import Any
+
+DIGEST_SIZE = 32
+_U64 = Struct("<Q")
+
+
+class DigestNode:
+    """The cached digest of a nested dictionary and the nodes of its children"""
+
+    __slots__ = ("digest", "children")
+    digest: bytes | None
+    children: dict[Any, DigestNode]
+
+    def __init__(self):
+        self.digest = None
+        self.children = {}
+
+    def invalidate(self, path: tuple) -> None:
+        """Reset the digests along the path and drop the nodes below it"""
+        node = self
+        node.digest = None
+        for head in path[:-1]:
+            node = node.children.get(head)
+            if node is None:
+                return
+            node.digest = None
+        if path:
+            node.children.pop(path[-1], None)
+
+
+def _hash(tag: bytes, parts) -> bytes:
+    h = blake2b(tag, digest_size=DIGEST_SIZE)
+    for part in parts:
+        h.update(_U64.pack(len(part)))
+        h.update(part)
+    return h.digest()
+
+
+def leaf_digest(value: Any) -> bytes:
+    if isinstance(value, NestedMKDict):
+        return value.digest()
+    cls = value.__class__
+    if cls is tuple or cls is list:
+        return _hash(b"t" if cls is tuple else b"l", map(leaf_digest, value))
+    if cls is set or cls is frozenset:
+        return _hash(b"s", sorted(map(leaf_digest, value)))
+    if isinstance(value, Mapping):
+        return _hash(b"m", _sorted_items(value.items(), leaf_digest))
+    tag = _leaf_tag(value)
+    return _hash(bytes((tag,)), (_encode_leaf(tag, value),))
+
+
+def _sorted_items(items, value_digest) -> list[bytes]:
+    return sorted(leaf_digest(k) + value_digest(v) for k, v in items)
+
+
+def tree_digest(dct: Mapping, types, node: DigestNode) -> bytes:
+    """The digest of the plain nested dictionary, cached in the node"""
+    if node.digest is not None:
+        return node.digest
+
+    # post-order: (dictionary, node, iterator, item digests)
+    stack = [(dct, node, iter(dct.items()), [])]
+    while stack:
+        dct, node, iterator, parts = stack[-1]
+        for k, v in iterator:
+            if isinstance(v, types):
+                child = node.children.get(k)
+                if child is None:
+                    child = node.children[k] = DigestNode()
+                if child.digest is None:
+                    stack.append((v, child, iter(v.items()), []))
+                    # revisit the item after the child is done
+                    parts.append((k, child))
+                    break
+                parts.append(leaf_digest(k) + child.digest)
+            else:
+                parts.append(leaf_digest(k) + leaf_digest(v))
+        else:
+            stack.pop()
+            node.digest = _hash(
+                b"d",
+                sorted(
+                    leaf_digest(p[0]) + p[1].digest if isinstance(p, tuple) else p
+                    for p in parts
+                ),
+            )
+
+    return node.digest
@@ -1,26 +1,67 @@
 from __future__ import annotations
 
 from collections import UserDict
-from collections.abc import Callable, Generator
+from collections.abc import Callable, Collection, Generator, Iterable, Mapping
+from operator import itemgetter
 from typing import Any
 
 
+def _canonical_tuple(key: Any) -> tuple:
+    """Sorted tuple of the key parts. A string is a single part."""
+    if isinstance(key, str):
+        return (key,)
+    return tuple(sorted(key))
+
+
+def _canonical_frozenset(key: Any) -> frozenset:
+    """Frozenset of the key parts. A string is a single part."""
+    if isinstance(key, frozenset):
+        return key
+    if isinstance(key, str):
+        return frozenset((key,))
+    return frozenset(key)
+
+
 class FlatMKDict(UserDict):
-    __slots__ = ('_protect', '_merge_flatdicts')
+    """
+    Map with the keys, which do not depend on the order of their parts.
+
+    The keys are stored as sorted tuples, or, with `frozenset_keys=True`, as
+    frozensets. The latter do not require the parts to be comparable and avoid
+    sorting, but the repeated parts are merged.
+    """
+
+    __slots__ = ('_protect', '_merge_flatdicts', '_index', '_frozenset_keys')
     _protect: bool
+    _frozenset_keys: bool
+    # key part -> the keys, containing the part (dict as an ordered set), built
+    # on the first filtered query and dropped, when the keys change
+    _index: dict[Any, dict[tuple | frozenset, None]] | None
 
-    def __init__(*args, protect: bool = False, **kwargs) -> None:
+    def __init__(
+        *args, protect: bool = False, frozenset_keys: bool = False, **kwargs
+    ) -> None:
         self = args[0]
         self._protect = protect
+        self._frozenset_keys = frozenset_keys
         self._merge_flatdicts = True
+        self._index = None
         UserDict.__init__(*args, **kwargs)
 
-    def _process_key(self, key: Any) -> tuple:
-        return tuple(sorted(key))
+    def _process_key(self, key: Any) -> tuple | frozenset:
+        if self._frozenset_keys:
+            return _canonical_frozenset(key)
+        return _canonical_tuple(key)
 
     def __getitem__(self, key: Any) -> Any:
         key = self._process_key(key)
-        return super().__getitem__(key)
+        try:
+            return self.data[key]
+        except KeyError:
+            pass
+        if hasattr(self.__class__, "__missing__"):
+            return self.__class__.__missing__(self, key)
+        raise KeyError(key)
 
     def __setitem__(self, key: Any, val: Any) -> None:
         key = self._process_key(key)
@@ -31,17 +72,147 @@ class FlatMKDict(UserDict):
             )
 
         if self._merge_flatdicts and isinstance(val, FlatMKDict):
-            for subkey, subval in val.items():
-                newkey = key+subkey
-                self[newkey] = subval
+            self.merge(val, key)
+            return
+
+        self._set_canonical(key, val)
+
+    @classmethod
+    def from_items(
+        cls,
+        items: Mapping | Iterable[tuple[Any, Any]],
+        *,
+        assume_canonical: bool = False,
+        protect: bool = False,
+        frozenset_keys: bool = False,
+    ) -> FlatMKDict:
+        """
+        Makes a new `FlatMKDict` from the items in a single batch.
+        With `assume_canonical=True` the keys are expected to be already sorted
+        tuples (frozensets for `frozenset_keys=True`) and are stored as is.
+        """
+        ret = cls(protect=protect, frozenset_keys=frozenset_keys)
+        if isinstance(items, Mapping):
+            items = items.items()
+        if assume_canonical and not protect:
+            # fill the data in a single dict.update, unless nested FlatMKDict
+            # values need to be merged
+            if not isinstance(items, Collection):
+                items = list(items)
+            types = set(map(type, map(itemgetter(1), items)))
+            if not any(issubclass(cls_, FlatMKDict) for cls_ in types):
+                ret.data.update(items)
+                return ret
+        ret._insert_many(items, assume_canonical=assume_canonical)
+        return ret
+
+    def update(self, other: Any = (), /, **kwargs) -> None:
+        self.merge(other)
+        if kwargs:
+            self.merge(kwargs)
+
+    def merge(self, other: Any, prefix: Any = ()) -> None:
+        """
+        Inserts the items of `other` (mapping or iterable of pairs) with the keys
+        extended by `prefix`.
+        """
+        if isinstance(other, Mapping):
+            items = other.items()
+        elif hasattr(other, "keys"):
+            items = ((key, other[key]) for key in other.keys())
+        else:
+            items = other
+
+        prefix = (prefix,) if isinstance(prefix, str) else tuple(prefix)
+        if prefix:
+            items = (
+                (prefix + ((key,) if isinstance(key, str) else tuple(key)), val)
+                for key, val in items
+            )
+            self._insert_many(items)
+        else:
+            canonical = (
+                isinstance(other, FlatMKDict)
+                and other._frozenset_keys == self._frozenset_keys
+            )
+            self._insert_many(items, assume_canonical=canonical)
+
+    def _insert_many(
+        self, items: Iterable[tuple[Any, Any]], *, assume_canonical: bool = False
+    ) -> None:
+        keys = []
+        values = []
+        process_key = self._process_key
+        merge_flatdicts = self._merge_flatdicts
+        for key, val in items:
+            if not assume_canonical:
+                key = process_key(key)
+            if merge_flatdicts and isinstance(val, FlatMKDict):
+                # keep the order of insertion
+                self._update_canonical(keys, values)
+                keys, values = [], []
+                self[key] = val
+                continue
+            keys.append(key)
+            values.append(val)
+        self._update_canonical(keys, values)
 
+    def _update_canonical(self, keys: list, values: list) -> None:
+        if not keys:
             return
+        data = self.data
+        if self._protect:
+            existing = data.keys() & keys
+            if not existing and len(set(keys)) != len(keys):
+                seen = set()
+                existing = (key for key in keys if key in seen or seen.add(key))
+            for key in existing:
+                raise AttributeError(
+                    f"Reassigning of the existed key '{key}' is restricted, "
+                    "due to the protection!"
+                )
 
-        super().__setitem__(key, val)
+        self._index = None
+        data.update(zip(keys, values))
 
-    def __contains__(self, key: Any) -> bool:
+    def _set_canonical(self, key: tuple | frozenset, val: Any) -> None:
+        if self._index is not None and key not in self.data:
+            self._index = None
+        self.data[key] = val
+
+    def __delitem__(self, key: Any) -> None:
         key = self._process_key(key)
-        return super().__contains__(key)
+        del self.data[key]
+        self._index = None
+
+    def _get_index(self) -> dict[Any, dict[tuple | frozenset, None]]:
+        index = self._index
+        if index is None:
+            index = self._index = {}
+            for key in self.data:
+                for part in key:
+                    try:
+                        index[part][key] = None
+                    except KeyError:
+                        index[part] = {key: None}
+        return index
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def copy(self) -> FlatMKDict:
+        ret = self.__class__(
+            protect=self._protect, frozenset_keys=self._frozenset_keys
+        )
+        ret._merge_flatdicts = self._merge_flatdicts
+        ret.data = self.data.copy()
+        return ret
+
+    __copy__ = copy
+
+    def __contains__(self, key: Any) -> bool:
+        return self._process_key(key) in self.data
 
     def values(self, *, keys: tuple = (), **kwargs) -> Generator:
         for _, val in self.items(*keys, **kwargs):
@@ -61,10 +232,10 @@ class FlatMKDict(UserDict):
         Returns items from the slice by `args`.
         If `args` are empty returns all items.
         """
-        res = super().items()
         if args:
-            args = set(args)
-            res = (elem for elem in res if args.issubset(elem[0]))
+            res = self._items_containing(args)
+        else:
+            res = super().items()
         if filterkey:
             res = (elem for elem in res if filterkey(elem[0]))
         if filterkeyelem:
@@ -81,11 +252,38 @@ class FlatMKDict(UserDict):
         Returns new `FlatMKDict` with keys containing `args`.
         It is possible to filter elements by `filterkey` and `filterkeyelem`.
         """
-        return FlatMKDict(
-            self.items( # pyright: ignore reportGeneralTypeIssues
-                *args,
-                filterkey=kwargs.pop("filterkey", None),
-                filterkeyelem=kwargs.pop("filterkeyelem", None),
-            ),
-            **kwargs,
+        items = self.items(
+            *args,
+            filterkey=kwargs.pop("filterkey", None),
+            filterkeyelem=kwargs.pop("filterkeyelem", None),
+        )
+        ret = FlatMKDict(
+            protect=kwargs.pop("protect", False),
+            frozenset_keys=kwargs.pop("frozenset_keys", self._frozenset_keys),
+        )
+        ret._insert_many(
+            items, assume_canonical=ret._frozenset_keys == self._frozenset_keys
         )
+        if kwargs:
+            ret.update(kwargs)
+        return ret
+
+    def _items_containing(self, args: tuple) -> Generator:
+        """
+        Yields the items, which keys contain all the `args`, in the order of insertion.
+        Intersects the posting sets of the index, starting from the smallest one.
+        """
+        index = self._get_index()
+        postings = []
+        for part in set(args):
+            posting = index.get(part)
+            if posting is None:
+                return
+            postings.append(posting)
+        postings.sort(key=len)
+        smallest, rest = postings[0], postings[1:]
+
+        data = self.data
+        for key in tuple(smallest):
+            if all(key in posting for posting in rest):
+                yield key, data[key]
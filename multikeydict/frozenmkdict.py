@@ -0,0 +1,535 @@
+from __future__ import annotations
+
+from collections.abc import Mapping
+from operator import itemgetter
+from typing import TYPE_CHECKING
+
+from .classwrapper import ClassWrapper
+from .nestedmkdict import (
+    NestedMKDict,
+    _flat_tuple_key,
+    _iterkey,
+    _keypath_cached,
+    _str_tuple_key,
+)
+from .visitor import MakeNestedMKDictVisitor, NestedMKDictVisitor
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Iterable
+    from typing import Any, Self
+
+    from .typing import KeyLike
+
+_BITS = 5
+_MASK = (1 << _BITS) - 1
+_HASHBITS = 64
+_HASHMASK = (1 << _HASHBITS) - 1
+_MISSING = object()
+_itemseq = itemgetter(2)
+
+
+class _BitmapNode:
+    """A node of the hash array mapped trie.
+
+    The entries are either (key, value, seq) triples or the nested nodes, seq
+    is the number of the key in the order of insertion. The bit
+    (hash >> shift) & _MASK of the bitmap is set for each present entry, the
+    entries are ordered by the bit.
+    """
+
+    __slots__ = ("bitmap", "entries")
+    bitmap: int
+    entries: tuple
+
+    def __init__(self, bitmap: int, entries: tuple):
+        self.bitmap = bitmap
+        self.entries = entries
+
+
+class _CollisionNode:
+    """A node with the triples, which keys have the same hash"""
+
+    __slots__ = ("hash", "entries")
+    hash: int
+    entries: tuple
+
+    def __init__(self, hash: int, entries: tuple):
+        self.hash = hash
+        self.entries = entries
+
+
+_EMPTY = _BitmapNode(0, ())
+
+
+def _hash(key: Any) -> int:
+    return hash(key) & _HASHMASK
+
+
+def _trie_get(node, h: int, key: Any) -> Any:
+    shift = 0
+    while True:
+        if isinstance(node, _CollisionNode):
+            for pair in node.entries:
+                if pair[0] == key:
+                    return pair[1]
+            return _MISSING
+
+        bit = 1 << ((h >> shift) & _MASK)
+        if not node.bitmap & bit:
+            return _MISSING
+        entry = node.entries[(node.bitmap & (bit - 1)).bit_count()]
+        if isinstance(entry, tuple):
+            return entry[1] if entry[0] == key else _MISSING
+        node = entry
+        shift += _BITS
+
+
+def _trie_merge(pair1: tuple, h1: int, pair2: tuple, h2: int, shift: int):
+    if h1 == h2 or shift >= _HASHBITS:
+        return _CollisionNode(h1, (pair1, pair2))
+
+    i1 = (h1 >> shift) & _MASK
+    i2 = (h2 >> shift) & _MASK
+    if i1 == i2:
+        return _BitmapNode(1 << i1, (_trie_merge(pair1, h1, pair2, h2, shift + _BITS),))
+    if i1 > i2:
+        pair1, pair2 = pair2, pair1
+    return _BitmapNode((1 << i1) | (1 << i2), (pair1, pair2))
+
+
+def _trie_set(
+    node, h: int, key: Any, value: Any, shift: int, seq: int
+) -> tuple[Any, bool]:
+    """Return the new node and a flag, whether a new key was added. A new key
+    gets the number seq, a replaced value keeps the number of the key"""
+    if isinstance(node, _CollisionNode):
+        if node.hash != h:
+            # Push the collision node one level down
+            bitmapnode = _BitmapNode(1 << ((node.hash >> shift) & _MASK), (node,))
+            return _trie_set(bitmapnode, h, key, value, shift, seq)
+        for i, pair in enumerate(node.entries):
+            if pair[0] == key:
+                entries = node.entries[:i] + ((key, value, pair[2]),) + node.entries[i + 1 :]
+                return _CollisionNode(h, entries), False
+        return _CollisionNode(h, node.entries + ((key, value, seq),)), True
+
+    bit = 1 << ((h >> shift) & _MASK)
+    idx = (node.bitmap & (bit - 1)).bit_count()
+    entries = node.entries
+    if not node.bitmap & bit:
+        entries = entries[:idx] + ((key, value, seq),) + entries[idx:]
+        return _BitmapNode(node.bitmap | bit, entries), True
+
+    entry = entries[idx]
+    if isinstance(entry, tuple):
+        if entry[0] == key:
+            if entry[1] is value:
+                return node, False
+            newentry, added = (key, value, entry[2]), False
+        else:
+            newentry = _trie_merge(
+                entry, _hash(entry[0]), (key, value, seq), h, shift + _BITS
+            )
+            added = True
+    else:
+        newentry, added = _trie_set(entry, h, key, value, shift + _BITS, seq)
+        if newentry is entry:
+            return node, False
+
+    entries = entries[:idx] + (newentry,) + entries[idx + 1 :]
+    return _BitmapNode(node.bitmap, entries), added
+
+
+def _trie_remove(node, h: int, key: Any, shift: int):
+    """Return the new node, a single remaining pair (to be inlined by the parent),
+    None (empty) or _MISSING if the key is not found"""
+    if isinstance(node, _CollisionNode):
+        for i, pair in enumerate(node.entries):
+            if pair[0] == key:
+                entries = node.entries[:i] + node.entries[i + 1 :]
+                if len(entries) == 1:
+                    return entries[0]
+                return _CollisionNode(node.hash, entries)
+        return _MISSING
+
+    bit = 1 << ((h >> shift) & _MASK)
+    if not node.bitmap & bit:
+        return _MISSING
+    idx = (node.bitmap & (bit - 1)).bit_count()
+    entry = node.entries[idx]
+    if isinstance(entry, tuple):
+        if entry[0] != key:
+            return _MISSING
+        newentry = None
+    else:
+        newentry = _trie_remove(entry, h, key, shift + _BITS)
+        if newentry is _MISSING:
+            return _MISSING
+
+    if newentry is None:
+        entries = node.entries[:idx] + node.entries[idx + 1 :]
+        if not entries:
+            return None
+        if len(entries) == 1 and isinstance(entries[0], tuple) and shift:
+            return entries[0]
+        return _BitmapNode(node.bitmap & ~bit, entries)
+
+    if isinstance(newentry, tuple) and len(node.entries) == 1 and shift:
+        return newentry
+    entries = node.entries[:idx] + (newentry,) + node.entries[idx + 1 :]
+    return _BitmapNode(node.bitmap, entries)
+
+
+def _trie_items(node) -> Generator[tuple[Any, Any, int], None, None]:
+    """Yield the (key, value, seq) triples in the order of the key hashes"""
+    for entry in node.entries:
+        if isinstance(entry, tuple):
+            yield entry
+        else:
+            yield from _trie_items(entry)
+
+
+class FrozenNestedMKDict:
+    """Immutable nested dictionary with the read API of NestedMKDict.
+
+    Each level is a persistent hash array mapped trie, the nested dictionaries
+    are FrozenNestedMKDict themselves. set() and pop() return new instances,
+    which share all the nodes, except the ones along the key (path copying).
+    The structural hash is cached, so the instances may be used as dictionary
+    keys, given the leaves are hashable. As for dict, the items go in the order
+    of insertion: a new key is appended, a replaced value keeps its place. Each
+    entry keeps the number of its key, the iteration sorts the entries by it.
+    The order does not affect the equality and the hash.
+    """
+
+    __slots__ = ("_trie", "_len", "_seq", "_sep", "_hash")
+    _trie: _BitmapNode
+    _len: int
+    # the number for the next new key
+    _seq: int
+    _sep: str | None
+    _hash: int | None
+
+    def __init__(
+        self,
+        dic: Mapping | NestedMKDict | FrozenNestedMKDict | None = None,
+        *,
+        sep: str | None = None,
+    ):
+        self._trie = _EMPTY
+        self._len = 0
+        self._seq = 0
+        self._hash = None
+
+        if isinstance(dic, FrozenNestedMKDict):
+            self._sep = dic._sep if sep is None else sep
+            self._trie = dic._trie
+            self._len = dic._len
+            self._seq = dic._seq
+            return
+        if isinstance(dic, NestedMKDict):
+            if sep is None:
+                sep = dic._sep
+            dic = dic._object
+        self._sep = sep
+        if dic is None:
+            return
+
+        trie = _EMPTY
+        for seq, (key, value) in enumerate(dic.items()):
+            if isinstance(value, (Mapping, ClassWrapper)):
+                value = self._make(value)
+            trie, _ = _trie_set(trie, _hash(key), key, value, 0, seq)
+        self._trie = trie
+        self._len = self._seq = len(dic)
+
+    def _make(
+        self, dic: Any = None, *, trie: _BitmapNode = _EMPTY, length: int = 0, seq: int = 0
+    ) -> Self:
+        if dic is not None:
+            return type(self)(dic, sep=self._sep)
+        ret = type(self).__new__(type(self))
+        ret._trie = trie
+        ret._len = length
+        ret._seq = seq
+        ret._sep = self._sep
+        ret._hash = None
+        return ret
+
+    def __str__(self):
+        return f"FrozenNestedMKDict({list(self.keys())})"
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __bool__(self) -> bool:
+        return self._len > 0
+
+    def _ordered(self) -> list[tuple[Any, Any, int]]:
+        return sorted(_trie_items(self._trie), key=_itemseq)
+
+    def __iter__(self):
+        for key, _, _ in self._ordered():
+            yield key
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            self._hash = hash(frozenset((key, value) for key, value, _ in _trie_items(self._trie)))
+        return self._hash
+
+    def __eq__(self, other) -> bool:
+        if self is other:
+            return True
+        if isinstance(other, FrozenNestedMKDict):
+            if self._len != other._len:
+                return False
+            if self._hash is not None and other._hash is not None and self._hash != other._hash:
+                return False
+        elif isinstance(other, (Mapping, NestedMKDict)):
+            if len(self) != len(other):
+                return False
+            if isinstance(other, NestedMKDict):
+                other = other._object
+        else:
+            return NotImplemented
+
+        for key, value, _ in _trie_items(self._trie):
+            othervalue = other.get(key, _MISSING)
+            if othervalue is _MISSING or not value == othervalue:
+                return False
+        return True
+
+    @property
+    def sep(self) -> str | None:
+        return self._sep
+
+    def keys(self):
+        return iter(self)
+
+    def items(self):
+        for key, value, _ in self._ordered():
+            yield key, value
+
+    def values(self):
+        for _, value, _ in self._ordered():
+            yield value
+
+    def iterkey(self, key):
+        yield from _iterkey(key, self._sep)
+
+    def keypath(self, key) -> tuple:
+        sep = self._sep
+        if key.__class__ is str:
+            return _keypath_cached(key, sep)
+        if key.__class__ is tuple:
+            if _flat_tuple_key(key, sep):
+                return key
+            if _str_tuple_key(key):
+                return _keypath_cached(key, sep)
+        return tuple(_iterkey(key, sep))
+
+    def _descend(self, key, path: tuple) -> Any:
+        """Return the value at path or _MISSING, raise TypeError for non-nested values"""
+        sub = self
+        for i, head in enumerate(path):
+            if not isinstance(sub, FrozenNestedMKDict):
+                raise TypeError(f"Nested value for {key} has wrong type")
+            sub = _trie_get(sub._trie, _hash(head), head)
+            if sub is _MISSING:
+                return _MISSING
+        return sub
+
+    def get_any(self, key, **_) -> Any:
+        path = self.keypath(key)
+        ret = self._descend(key, path)
+        if ret is _MISSING:
+            raise KeyError(f"No nested key '{key}'")
+        return ret
+
+    __getitem__ = get_any
+
+    def get_dict(self, key) -> Self:
+        ret = self.get_any(key)
+        if not isinstance(ret, FrozenNestedMKDict):
+            raise TypeError(f"Invalid value type {type(ret)} for key ({key}).")
+        return ret
+
+    __call__ = get_dict
+
+    def get_value(self, key) -> Any:
+        if key == ():
+            raise TypeError("May not return self")
+        ret = self.get_any(key)
+        if isinstance(ret, FrozenNestedMKDict):
+            raise TypeError(f"Invalid value type {type(ret)} for key {key}. Expect non-mapping.")
+        return ret
+
+    def get(self, key, default=None) -> Any:
+        ret = self._descend(key, self.keypath(key))
+        if ret is _MISSING:
+            return default
+        return ret
+
+    def __contains__(self, key) -> bool:
+        return self._descend(key, self.keypath(key)) is not _MISSING
+
+    def set(self, key, value) -> Self:
+        """Return a new instance with the value set for the key"""
+        path = self.keypath(key)
+        if not path:
+            raise KeyError(key)
+        if isinstance(value, (Mapping, ClassWrapper)) and not isinstance(
+            value, FrozenNestedMKDict
+        ):
+            value = self._make(value)
+        return self._set(key, path, 0, value)
+
+    def _set(self, key, path: tuple, i: int, value: Any) -> Self:
+        head = path[i]
+        h = _hash(head)
+        if i + 1 < len(path):
+            sub = _trie_get(self._trie, h, head)
+            if sub is _MISSING:
+                sub = self._make()
+            elif not isinstance(sub, FrozenNestedMKDict):
+                raise TypeError(f"Nested value for {key} has wrong type")
+            value = sub._set(key, path, i + 1, value)
+
+        trie, added = _trie_set(self._trie, h, head, value, 0, self._seq)
+        if trie is self._trie:
+            return self
+        return self._make(trie=trie, length=self._len + added, seq=self._seq + added)
+
+    def pop(self, key) -> Self:
+        """Return a new instance without the key"""
+        path = self.keypath(key)
+        if not path:
+            raise ValueError("May not delete itself")
+        return self._pop(key, path, 0)
+
+    def _pop(self, key, path: tuple, i: int) -> Self:
+        head = path[i]
+        h = _hash(head)
+        if i + 1 < len(path):
+            sub = _trie_get(self._trie, h, head)
+            if sub is _MISSING:
+                raise KeyError(key)
+            if not isinstance(sub, FrozenNestedMKDict):
+                raise TypeError(f"Nested value for {key} has wrong type")
+            trie, _ = _trie_set(self._trie, h, head, sub._pop(key, path, i + 1), 0, self._seq)
+            return self._make(trie=trie, length=self._len, seq=self._seq)
+
+        trie = _trie_remove(self._trie, h, head, 0)
+        if trie is _MISSING:
+            raise KeyError(key)
+        if trie is None:
+            trie = _EMPTY
+        elif isinstance(trie, tuple):
+            trie = _BitmapNode(1 << (_hash(trie[0]) & _MASK), (trie,))
+        return self._make(trie=trie, length=self._len - 1, seq=self._seq)
+
+    def unfreeze(self, **kwargs) -> NestedMKDict:
+        """Return a NestedMKDict with plain nested dictionaries"""
+        ret = {}
+        stack = [(self, ret)]
+        while stack:
+            source, target = stack.pop()
+            for k, v in source.items():
+                if isinstance(v, FrozenNestedMKDict):
+                    target[k] = newsub = {}
+                    stack.append((v, newsub))
+                else:
+                    target[k] = v
+        kwargs.setdefault("sep", self._sep)
+        return NestedMKDict(ret, **kwargs)
+
+    def walkitems(
+        self,
+        startfromkey=(),
+        *,
+        include_dicts: bool = False,
+        appendstartkey: bool = False,
+        maxdepth: int | None = None,
+    ) -> Generator[tuple[tuple, Any], None, None]:
+        k0 = self.keypath(startfromkey)
+        v0 = self.get_any(startfromkey) if k0 else self
+
+        if maxdepth == 0 or not isinstance(v0, FrozenNestedMKDict):
+            yield (k0 if appendstartkey else ()), v0
+            return
+
+        maxlevel = None if maxdepth is None else maxdepth - len(k0)
+        if not appendstartkey:
+            k0 = ()
+
+        stack = [(k0, v0.items())]
+        while stack:
+            k0, iterator = stack[-1]
+            level = len(stack)
+            for k, v in iterator:
+                k = k0 + (k,)
+                if isinstance(v, FrozenNestedMKDict):
+                    if include_dicts:
+                        yield k, v
+                    if maxlevel is not None and level >= maxlevel:
+                        yield k, v
+                        continue
+                    stack.append((k, v.items()))
+                    break
+                yield k, v
+            else:
+                stack.pop()
+
+    def walkkeys(self, *args, **kwargs):
+        for k, _ in self.walkitems(*args, **kwargs):
+            yield k
+
+    def walkvalues(self, *args, **kwargs):
+        for _, v in self.walkitems(*args, **kwargs):
+            yield v
+
+    def walkjoinedkeys(self, *args, sep: str | None = None, **kwargs):
+        for k, _ in self.walkjoineditems(*args, sep=sep, **kwargs):
+            yield k
+
+    def walkjoineditems(self, *args, sep: str | None = None, **kwargs):
+        if sep is None:
+            sep = self._sep
+        if sep is None:
+            sep = "."
+        for k, v in self.walkitems(*args, **kwargs):
+            yield sep.join(k), v
+
+    def flatten(self, sep: str | None = None) -> dict[str, Any]:
+        return dict(self.walkjoineditems(sep=sep))
+
+    def visit(self, visitor, parentkey=()) -> NestedMKDictVisitor:
+        visitor = MakeNestedMKDictVisitor(visitor)
+
+        if not parentkey:
+            visitor.start(self)
+
+        visitor.enterdict(parentkey, self)
+        for k, v in self.items():
+            key = parentkey + (k,)
+            if isinstance(v, FrozenNestedMKDict):
+                v.visit(visitor, parentkey=key)
+            else:
+                visitor.visit(key, v)
+
+        visitor.exitdict(parentkey, self)
+
+        if not parentkey:
+            visitor.stop(self)
+
+        return visitor
+
+    @classmethod
+    def from_flatdict(
+        cls,
+        dct: Mapping[KeyLike, Any] | Iterable[tuple[KeyLike, Any]],
+        *,
+        sep: str | None = None,
+    ) -> Self:
+        """Make a frozen nested dictionary from a flat dictionary."""
+        return cls(NestedMKDict.from_flatdict(dct, sep=sep))
@@ -1,12 +1,13 @@
 from __future__ import annotations
 
 from collections.abc import Mapping, MutableMapping, Sequence
-from contextlib import suppress
+from contextlib import contextmanager, nullcontext, suppress
+from functools import lru_cache
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
-    from typing import Any, Self
-    from collections.abc import Generator, Iterable
+    from typing import Any, BinaryIO, Self
+    from collections.abc import Callable, Generator, Iterable
 
 from .classwrapper import ClassWrapper
 from .flatmkdict import FlatMKDict
@@ -15,6 +16,268 @@ from .nestedmkdictaccess import NestedMKDictAccess
 from .typing import KeyLike
 from .visitor import MakeNestedMKDictVisitor, NestedMKDictVisitor
 
+KEYPATH_CACHE_SIZE = 2**14
+
+
+def _iterkey(key, sep: str | None):
+    if isinstance(key, str):
+        if sep:
+            yield from key.split(sep)
+        else:
+            yield key
+    elif isinstance(key, Sequence):
+        for sk in key:
+            yield from _iterkey(sk, sep)
+    else:
+        yield key
+
+
+_MISSING = object()
+# The old/new value of the added/removed keys, reported to the observers
+MISSING = _MISSING
+
+
+def _flat_tuple_key(key: tuple, sep: str | None) -> bool:
+    """Check that the tuple key is its own path: it consists of strings, which
+    are not split by sep"""
+    for part in key:
+        if part.__class__ is not str or (sep and sep in part):
+            return False
+    return True
+
+
+def _str_tuple_key(key: tuple) -> bool:
+    """Check that the tuple key consists of strings only"""
+    for part in key:
+        if part.__class__ is not str:
+            return False
+    return True
+
+
+# Only the str keys and the tuples of str are cached: the equal parts of the
+# different types (1, True, 1.0) would share a cache entry inside a tuple
+@lru_cache(maxsize=KEYPATH_CACHE_SIZE, typed=True)
+def _keypath_cached(key, sep: str | None) -> tuple:
+    return tuple(_iterkey(key, sep))
+
+
+def _owned_child(dct: MutableMapping, key: Any, child: Any, owned: set[int]) -> Any:
+    """Return dct[key], replaced by a copy, if it is not owned by the tree"""
+    if id(child) not in owned:
+        child = dct[key] = child.copy()
+        owned.add(id(child))
+    return child
+
+
+def _plain_part(part: Any, sep: str | None) -> bool:
+    """Check that the key part is its own path: neither split by sep, nor a sequence"""
+    if part.__class__ is str:
+        return not (sep and sep in part)
+    return not isinstance(part, (str, Sequence))
+
+
+def _common_prefix_length(path: tuple, prevpath: tuple, maxlength: int) -> int:
+    i = 0
+    while i < maxlength and path[i] == prevpath[i]:
+        i += 1
+    return i
+
+
+def _keyerror_rest(key, rest: tuple) -> KeyError:
+    error = KeyError(f"{key}: {rest}")
+    with suppress(RuntimeError):
+        error.rest = rest  # pyright: ignore [reportAttributeAccessIssue]
+    return error
+
+
+def _iterleaves(dct: MutableMapping, prefix: tuple, types) -> Generator:
+    """Yield (key, value) for the leaves of the plain nested dictionary"""
+    stack = [(prefix, iter(dct.items()))]
+    while stack:
+        prefix, iterator = stack[-1]
+        for k, v in iterator:
+            if isinstance(v, NestedMKDict):
+                v = v._object
+            if isinstance(v, types):
+                stack.append((prefix + (k,), iter(v.items())))
+                break
+            yield prefix + (k,), v
+        else:
+            stack.pop()
+
+
+def _iterindexed(dct: MutableMapping, prefix: tuple, types) -> Generator:
+    """Yield (key, value) for the leaves of the plain nested dictionary to be
+    kept in the leaf index. The stored NestedMKDict values are not indexed: they
+    may be modified by their own methods and handle the rest of the key."""
+    stack = [(prefix, iter(dct.items()))]
+    while stack:
+        prefix, iterator = stack[-1]
+        for k, v in iterator:
+            if isinstance(v, types):
+                stack.append((prefix + (k,), iter(v.items())))
+                break
+            if not isinstance(v, NestedMKDict):
+                yield prefix + (k,), v
+        else:
+            stack.pop()
+
+
+class _TreeState:
+    """The data, shared by the whole tree and kept by its root NestedMKDict.
+
+    leafindex: {tuple_key: value} for all the leaves, except the ones within
+               the stored NestedMKDict values, or None
+    owned: ids of the dictionaries, which may be modified in place, or None if
+           the tree does not share the dictionaries with snapshots
+    digests: the trie of the cached digests of the nested dictionaries, or None
+    observers: [(prefix, callback)] subscribed to the changes, or None
+    pending: the changes, collected for the observers during a batch, or None
+    """
+
+    __slots__ = ("leafindex", "owned", "digests", "observers", "pending")
+    leafindex: dict[tuple, Any] | None
+    owned: set[int] | None
+    digests: Any
+    observers: list[tuple[tuple, Callable]] | None
+    pending: list[tuple[tuple, Any, Any]] | None
+
+    def __init__(self):
+        self.leafindex = None
+        self.owned = None
+        self.digests = None
+        self.observers = None
+        self.pending = None
+
+    def tracks_changes(self) -> bool:
+        return (
+            self.leafindex is not None
+            or self.digests is not None
+            or self.observers is not None
+        )
+
+    def changed(self, path: tuple, old: Any, new: Any, types) -> None:
+        """Handle the replacement of old by new at path (absolute). The
+        observers are notified after the bookkeeping, so a failing callback
+        does not leave the tree inconsistent."""
+        self.update_index(path, old, new, types)
+        if self.digests is not None:
+            self.digests.invalidate(path)
+        if self.observers is not None:
+            self.notify(path, old, new)
+
+    def update_index(self, path: tuple, old: Any, new: Any, types) -> None:
+        index = self.leafindex
+        if index is None:
+            return
+
+        # the stored NestedMKDict values are not indexed
+        new_is_leaf = new is not _MISSING and not isinstance(new, (types, NestedMKDict))
+        if isinstance(old, types):
+            for key, _ in _iterindexed(old, path, types):
+                del index[key]
+        elif old is not _MISSING and not isinstance(old, NestedMKDict) and not new_is_leaf:
+            # a leaf, replaced by a leaf, keeps its position
+            del index[path]
+
+        if new_is_leaf:
+            index[path] = new
+        elif isinstance(new, types):
+            index.update(_iterindexed(new, path, types))
+
+    @contextmanager
+    def subtree_changed(self, path: tuple, sub: Any, types):
+        """Track the subtree, modified in place, for example, by a stored NestedMKDict.
+        The observers are notified with sub as both the old and the new value."""
+        self.update_index(path, sub, _MISSING, types)
+        try:
+            yield
+        finally:
+            self.update_index(path, _MISSING, sub, types)
+            if self.digests is not None:
+                self.digests.invalidate(path)
+            if self.observers is not None:
+                self.notify(path, sub, sub)
+
+    def notify(self, path: tuple, old: Any, new: Any) -> None:
+        change = (path, old, new)
+        if self.pending is not None:
+            self.pending.append(change)
+        else:
+            self.deliver([change])
+
+    def deliver(self, changes: list[tuple[tuple, Any, Any]]) -> None:
+        """Call each observer once with the changes within its prefix: the
+        changes below the prefix, or of the dictionaries, containing it"""
+        for prefix, callback in tuple(self.observers or ()):
+            n = len(prefix)
+            selected = [
+                change
+                for change in changes
+                if change[0][:n] == prefix or prefix[: len(change[0])] == change[0]
+            ]
+            if selected:
+                callback(selected)
+
+    @contextmanager
+    def batch(self):
+        """Collect the changes and deliver them to the observers at the exit
+        of the outermost batch"""
+        if self.pending is not None:
+            yield
+            return
+        self.pending = []
+        try:
+            yield
+        finally:
+            changes, self.pending = self.pending, None
+            if changes:
+                self.deliver(changes)
+
+
+_SCALAR_TYPES = frozenset((bool, int, float, complex, str, bytes))
+
+
+def _same_leaf(old: Any, new: Any) -> bool:
+    """The leaf is unchanged: the same object, or an equal immutable scalar"""
+    if old is new:
+        return True
+    cls = old.__class__
+    return cls is new.__class__ and cls in _SCALAR_TYPES and old == new
+
+
+class ChangeSet:
+    """The key paths (relative to the updated dictionary), affected by a merge.
+
+    added: the new leaves
+    replaced: the leaves with a different value, including the nested
+              dictionaries, replaced by a leaf
+    unchanged: the leaves, set to the same object or an equal scalar
+    """
+
+    __slots__ = ("added", "replaced", "unchanged")
+    added: list[tuple]
+    replaced: list[tuple]
+    unchanged: list[tuple]
+
+    def __init__(self):
+        self.added = []
+        self.replaced = []
+        self.unchanged = []
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.replaced)
+
+    def changed(self) -> list[tuple]:
+        """The added and the replaced key paths"""
+        return self.added + self.replaced
+
+    def __repr__(self):
+        return (
+            f"ChangeSet(added={len(self.added)}, replaced={len(self.replaced)},"
+            f" unchanged={len(self.unchanged)})"
+        )
+
 
 class NestedMKDict(ClassWrapper):
     """Dictionary wrapper managing nested dictionaries.
@@ -24,12 +287,26 @@ class NestedMKDict(ClassWrapper):
     - Optionally sep symbol may be set to automatically split string keys into tuple keys:
       'key1.key2.key3' will be treated as a nested key if '.' is set for the sep symbol
     - self._ may be used to access nested dictionaries via attributes: dw.key1.key2.key3
+    - Optionally (leaf_index=True) the root keeps a flat {tuple_key: value} index of
+      the leaves, updated on modifications. The full key access becomes a single
+      lookup, the iteration follows the tree order. The modifications, made
+      bypassing the NestedMKDict methods, are not tracked. The copies and the
+      wrappers of the tree share the index (see copy()).
     """
 
-    __slots__ = ("_sep", "_parent", "_types", "_not_recursive_to_others")
+    __slots__ = (
+        "_sep",
+        "_parent",
+        "_parent_key",
+        "_types",
+        "_not_recursive_to_others",
+        "_state",
+    )
     _sep: str | None
     _parent: Any
+    _parent_key: Any
     _not_recursive_to_others: bool
+    _state: _TreeState | None
 
     def __new__(cls, dic: MutableMapping = {}, *args, **kwargs):
         if not isinstance(dic, (MutableMapping, NestedMKDict)):
@@ -42,20 +319,29 @@ class NestedMKDict(ClassWrapper):
         *,
         sep: str | None = None,
         parent: Any | None = None,
+        parent_key: Any = _MISSING,
         recursive_to_others: bool = False,
+        leaf_index: bool = False,
     ):
         if dic is None:
             dic = {}
+        shared = None
         if isinstance(dic, NestedMKDict):
             if sep is None:
                 sep = dic._sep
             recursive_to_others = not dic._not_recursive_to_others
+            shared = dic._shared_tree()
             dic = dic._object
-        super().__init__(dic, types=type(dic))
+        # The nested dictionaries are treated with the type of the root, which
+        # may be a subclass of the type of the nested objects
+        types = getattr(parent, "_types", None) if parent is not None else None
+        super().__init__(dic, types=type(dic) if types is None else types)
 
         self._sep = sep
         self._not_recursive_to_others = not recursive_to_others
         self._parent = parent
+        self._parent_key = parent_key
+        self._state = None
         if parent:
             if sep and sep != parent._sep:
                 raise ValueError(
@@ -66,6 +352,20 @@ class NestedMKDict(ClassWrapper):
             self._types = parent._types
             self._not_recursive_to_others = parent._not_recursive_to_others
 
+        if leaf_index:
+            if parent is not None:
+                raise ValueError("leaf_index may be enabled only for the root")
+            if not self._not_recursive_to_others:
+                raise ValueError("leaf_index is not supported with recursive_to_others")
+            self._state = _TreeState()
+            self._state.leafindex = dict(_iterindexed(dic, (), self._types))
+        elif shared is not None and parent is None:
+            # the same dictionaries: the same tree
+            self._types = shared._types
+            self._state = shared._state
+            self._parent = shared._parent
+            self._parent_key = shared._parent_key
+
     def __str__(self):
         return f"NestedMKDict({list(self.keys())})"
 
@@ -86,14 +386,28 @@ class NestedMKDict(ClassWrapper):
     ) -> Self:
         """Make a nested dictionary from a flat dictionary."""
         ret = cls({}, *args, **kwargs)
-        if isinstance(dct, Mapping):
-            iterable = dct.items()
-        else:
-            iterable = dct
-        for key, value in iterable:
-            ret[key] = value
+        ret.set_many(dct)
         return ret
 
+    def dump(self, fileobj: BinaryIO) -> None:
+        """Write the tree in the binary format of multikeydict.binary"""
+        from .binary import write_tree
+
+        write_tree(fileobj, self)
+
+    @classmethod
+    def load(cls, fileobj: BinaryIO, *, lazy: bool = True, **kwargs) -> Self:
+        """Read the tree, written by dump().
+
+        With `lazy`, only the keys of the root dictionary are decoded, the
+        nested dictionaries and the values are decoded on the first access.
+        The numpy arrays are writable views of the data, read from `fileobj`.
+        """
+        from .binary import make_nestedmkdict, read_tree
+
+        root, meta = read_tree(bytearray(fileobj.read()), lazy=lazy)
+        return make_nestedmkdict(root, meta, cls=cls, **kwargs)
+
     @property
     def _(self):
         return NestedMKDictAccess(self)
@@ -104,14 +418,37 @@ class NestedMKDict(ClassWrapper):
 
     @property
     def parent_key(self):
-        if not self._parent:
+        if self._parent is None:
             return None
-        for key, value in self._parent.items():
-            if isinstance(value, NestedMKDict) and value.object is self.object:
+
+        parentobj = self._parent._object
+        key = self._parent_key
+        if key is not _MISSING:
+            value = parentobj.get(key, _MISSING)
+            if isinstance(value, NestedMKDict):
+                value = value._object
+            if value is self._object:
+                return key
+
+        # The key is unknown or the dictionary was moved
+        for key, value in parentobj.items():
+            if isinstance(value, NestedMKDict):
+                value = value._object
+            if value is self._object:
                 return key
 
         raise RuntimeError("Parent key not identified")
 
+    @property
+    def path(self) -> tuple:
+        """The key of the dictionary, relative to the root of the tree"""
+        keys = []
+        current = self
+        while current._parent is not None:
+            keys.append(current.parent_key)
+            current = current._parent
+        return tuple(reversed(keys))
+
     def get_parent(self, level: int = 1) -> Self | None:
         if level == 0:
             return self
@@ -134,7 +471,7 @@ class NestedMKDict(ClassWrapper):
             if type is None:
                 type = self._types
             self[key] = (ret := type(*args, **kwargs))
-            return self._wrap(ret, parent=self)
+            return self._wrap_at(self.keypath(key), ret)
 
         if not isinstance(ret, self._wrapper_class):
             raise KeyError(f"Child {key!s} is not NestedMKDict")
@@ -144,26 +481,29 @@ class NestedMKDict(ClassWrapper):
     def get_dict(self, key, *, unwrap: bool = False) -> Self:
         if key == ():
             return self
-        head, rest = self.splitkey(key)
+        path = self.keypath(key)
+        if not path:
+            return self
 
-        try:
-            sub = self._object[head]
-        except KeyError as e:
-            raise KeyError(key) from e
-
-        if rest:
-            sub = self._wrap(sub, parent=self)
-            if self._not_recursive_to_others and not isinstance(sub, NestedMKDict):
-                raise TypeError(
-                    f"Expect nested dictionary as value for {key}, got {type(sub).__name__}"
+        types = self._types
+        sub = self._object
+        for i, head in enumerate(path):
+            if i and not isinstance(sub, types):
+                sub = self._nested_other(
+                    sub,
+                    f"Expect nested dictionary as value for {key}, got {type(sub).__name__}",
                 )
+                try:
+                    return sub.get_dict(path[i:], unwrap=unwrap)
+                except KeyError as e:
+                    raise KeyError(key) from e
 
             try:
-                return sub.get_dict(rest, unwrap=unwrap)
+                sub = sub[head]
             except KeyError as e:
                 raise KeyError(key) from e
 
-        if not isinstance(sub, (ClassWrapper, self._types)):
+        if not isinstance(sub, (ClassWrapper, types)):
             raise TypeError(
                 f"Invalid value type {type(sub)} for key ({key}). Expect non-mapping. Perhaps, one should use [{key}] or .get_any({key})..."
             )
@@ -171,7 +511,7 @@ class NestedMKDict(ClassWrapper):
         if unwrap:
             return sub
 
-        return self._wrap_(sub, parent=self)
+        return self._wrap_at(path, sub)
 
     __call__ = get_dict
 
@@ -179,23 +519,31 @@ class NestedMKDict(ClassWrapper):
         return self._object.keys()
 
     def iterkey(self, key):
-        if isinstance(key, str):
-            if self._sep:
-                yield from key.split(self._sep)
-            else:
-                yield key
-        elif isinstance(key, Sequence):
-            for sk in key:
-                yield from self.iterkey(sk)
-        else:
-            yield key
+        yield from _iterkey(key, self._sep)
+
+    def keypath(self, key) -> tuple:
+        """Return the key as a tuple of its parts.
+
+        The parsed str keys and tuples of str are kept in a bounded LRU cache,
+        shared by all the instances, so a key is split only once. A tuple of the
+        strings, which need no splitting, is returned as is. The keys with
+        non-str parts are parsed each time, keeping the types of the parts.
+        """
+        sep = self._sep
+        if key.__class__ is str:
+            return _keypath_cached(key, sep)
+        if key.__class__ is tuple:
+            if _flat_tuple_key(key, sep):
+                return key
+            if _str_tuple_key(key):
+                return _keypath_cached(key, sep)
+        return tuple(_iterkey(key, sep))
 
     def splitkey(self, key) -> Any:
-        it = self.iterkey(key)
-        try:
-            return next(it), tuple(it)
-        except StopIteration:
+        path = self.keypath(key)
+        if not path:
             return None, None
+        return path[0], path[1:]
 
     def joinkey(self, key: KeyLike) -> str:
         if isinstance(key, str):
@@ -207,29 +555,110 @@ class NestedMKDict(ClassWrapper):
 
         raise ValueError(f"Invalid key: {key}")
 
+    def _nested_other(self, sub: Any, message: str) -> Any:
+        """Check the non-dictionary value, met on the way down the nested key.
+
+        The value should handle the rest of the key by itself: either it is a
+        stored NestedMKDict, or a mapping, if recursive_to_others is set.
+        """
+        if self._not_recursive_to_others and not isinstance(sub, NestedMKDict):
+            raise TypeError(message)
+        return sub
+
+    def _wrap_at(self, path: tuple, obj: Any) -> Self:
+        """Wrap obj, found at path, with the parents chain along the path.
+
+        The descent itself works with the plain dictionaries, the wrappers are
+        created only for the returned value.
+        """
+        parent = self
+        sub = self._object
+        for head in path[:-1]:
+            sub = sub[head]
+            parent = self._wrapper_class(sub, parent=parent, parent_key=head)
+        return self._wrap_(obj, parent=parent, parent_key=path[-1])
+
+    def _root(self) -> Self:
+        root = self
+        while root._parent is not None:
+            root = root._parent
+        return root
+
+    def _prepare_write(self) -> tuple[_TreeState | None, set[int] | None, Any]:
+        """Return the tree state, the ids of the dictionaries, owned by the tree (if
+        it shares the dictionaries with snapshots), and the dictionary to write to.
+
+        The shared dictionaries from the root down to self are replaced by copies.
+        """
+        root = self._root()
+        state = root._state
+        if state is None or state.owned is None:
+            return state, None, self._object
+
+        owned = state.owned
+        chain = []
+        current = self
+        while current._parent is not None:
+            chain.append(current)
+            current = current._parent
+
+        obj = root._object
+        if id(obj) not in owned:
+            obj = root._object = obj.copy()
+            owned.add(id(obj))
+        for wrapper in reversed(chain):
+            key = wrapper._parent_key
+            if key is _MISSING:
+                key = wrapper.parent_key
+            sub = obj.get(key, _MISSING)
+            if not isinstance(sub, self._types):
+                raise RuntimeError(f"The dictionary {self.path} is no longer in the tree")
+            wrapper._object = obj = _owned_child(obj, key, sub, owned)
+
+        return state, owned, obj
+
+    def _changed(self, state: _TreeState, path: tuple, old: Any, new: Any) -> None:
+        """Report the replacement of old by new at path to the tree state"""
+        if self._parent is not None:
+            path = self.path + path
+        state.changed(path, old, new, self._types)
+
+    def _track_subtree(self, state: _TreeState | None, path: tuple, sub: Any):
+        """Report the in-place modification of a value, handling the rest of a key"""
+        if state is None:
+            return nullcontext()
+        if self._parent is not None:
+            path = self.path + path
+        return state.subtree_changed(path, sub, self._types)
+
     def get(self, key, default=None):
         if key == ():
             raise TypeError("May not return self")
 
-        head, rest = self.splitkey(key)
-
-        if head not in self._object:
-            if rest:
-                raise KeyError(key)
-            else:
-                return default
-
-        sub = self._object.get(head)
-        if rest:
-            sub = self._wrap(sub, parent=self)
-            if self._not_recursive_to_others and not isinstance(sub, NestedMKDict):
-                raise TypeError(
-                    f"Expect non-mapping as value for {key}, got {type(sub).__name__}"
+        path = self.keypath(key)
+        state = self._state
+        if state is not None and (index := state.leafindex) is not None:
+            value = index.get(path, _MISSING)
+            if value is not _MISSING:
+                return value
+
+        types = self._types
+        sub = self._object
+        for i, head in enumerate(path):
+            if i and not isinstance(sub, types):
+                sub = self._nested_other(
+                    sub,
+                    f"Expect non-mapping as value for {key}, got {type(sub).__name__}",
                 )
+                return sub.get(path[i:], default)
 
-            return sub.get(rest, default)
+            sub = sub.get(head, _MISSING)
+            if sub is _MISSING:
+                if i + 1 < len(path):
+                    raise KeyError(key)
+                return default
 
-        if isinstance(sub, (ClassWrapper, self._types)):
+        if isinstance(sub, (ClassWrapper, types)):
             raise TypeError(
                 f"Invalid value type {type(sub)} for key [{key}]. Expect non-mapping. Perhaps, one should use ({key}) or .get_any({key})..."
             )
@@ -240,32 +669,34 @@ class NestedMKDict(ClassWrapper):
         if key == ():
             raise TypeError("May not return self")
 
-        head, rest = self.splitkey(key)
-
-        try:
-            sub = self._object.__getitem__(head)
-        except KeyError as e:
-            raise KeyError(f"{key}: {head}") from e
-
-        if rest:
-            sub = self._wrap(sub, parent=self)
-            if self._not_recursive_to_others and not isinstance(sub, NestedMKDict):
-                raise TypeError(
-                    f"Expect non-mapping as value for {key}, got {type(sub).__name__}"
+        path = self.keypath(key)
+        state = self._state
+        if state is not None and (index := state.leafindex) is not None:
+            value = index.get(path, _MISSING)
+            if value is not _MISSING:
+                return value
+
+        types = self._types
+        sub = self._object
+        for i, head in enumerate(path):
+            if i and not isinstance(sub, types):
+                sub = self._nested_other(
+                    sub,
+                    f"Expect non-mapping as value for {key}, got {type(sub).__name__}",
                 )
+                try:
+                    if isinstance(sub, NestedMKDict):
+                        return sub.get_value(path[i:])
+                    return sub[path[i:]]
+                except KeyError as e:
+                    raise _keyerror_rest(key, getattr(e, "rest", path[i:])) from e
 
             try:
-                return sub.get_value(rest)
+                sub = sub[head]
             except KeyError as e:
-                failed_rest = getattr(e, "rest", rest)
-                error = KeyError(f"{key}: {failed_rest}")
-                with suppress(RuntimeError):
-                    error.rest = (  # pyright: ignore [reportAttributeAccessIssue]
-                        failed_rest
-                    )
-                raise error from e
-
-        if isinstance(sub, (ClassWrapper, self._types)):
+                raise _keyerror_rest(key, path[i:]) from e
+
+        if isinstance(sub, (ClassWrapper, types)):
             raise TypeError(
                 f"Invalid value type {type(sub)} for key {key}. Expect non-mapping."
             )
@@ -274,48 +705,116 @@ class NestedMKDict(ClassWrapper):
     def get_any(self, key, *, unwrap: bool = False) -> Any:
         if key == ():
             return self
-        head, rest = self.splitkey(key)
+        path = self.keypath(key)
+        if not path:
+            return self
 
-        try:
-            sub = self._object.__getitem__(head)
-        except KeyError as e:
-            raise KeyError(f"No nested key '{key}'") from e
-
-        if not rest:
-            if unwrap:
-                return sub
-            sub = self._wrap(sub, parent=self)
+        state = self._state
+        if state is not None and (index := state.leafindex) is not None:
+            value = index.get(path, _MISSING)
+            if value is not _MISSING:
+                return value
+
+        types = self._types
+        sub = self._object
+        for i, head in enumerate(path):
+            if i and not isinstance(sub, types):
+                sub = self._nested_other(sub, f"Nested value for {key} has wrong type")
+                try:
+                    if unwrap and isinstance(sub, NestedMKDict):
+                        return sub.get_any(path[i:], unwrap=unwrap)
+                    return sub[path[i:]]
+                except KeyError as e:
+                    raise KeyError(key) from e
+
+            try:
+                sub = sub[head]
+            except KeyError as e:
+                raise KeyError(f"No nested key '{key}'") from e
+
+        if unwrap or not isinstance(sub, types):
             return sub
 
-        sub = self._wrap(sub, parent=self)
-        if self._not_recursive_to_others and not isinstance(sub, NestedMKDict):
-            raise TypeError(f"Nested value for {key} has wrong type")
+        return self._wrap_at(path, sub)
 
-        try:
-            if unwrap:
-                return sub.get_any(rest, unwrap=unwrap)
+    __getitem__ = get_any
+
+    def get_many(self, keys: Iterable[KeyLike], *, unwrap: bool = False) -> list:
+        """Return a list of values for the keys, similar to get_any().
+
+        The dictionaries along the previous key are kept, so each key descends
+        only the part, which differs from the previous key. The keys in the
+        walkitems() order share the longest prefixes.
+        """
+        types = self._types
+        prevpath = ()
+        subs = [self._object]
+        ret = []
+        for key in keys:
+            path = self.keypath(key)
+            if not path:
+                ret.append(self)
+                continue
+
+            last = len(path) - 1
+            i = _common_prefix_length(path, prevpath, min(last, len(subs) - 1))
+            del subs[i + 1 :]
+            sub = subs[-1]
+            for head in path[i:last]:
+                sub = sub.get(head, _MISSING)
+                if not isinstance(sub, types):
+                    break
+                subs.append(sub)
             else:
-                return sub[rest]
-        except KeyError as e:
-            raise KeyError(key) from e
+                sub = sub.get(path[last], _MISSING)
+                if sub is not _MISSING:
+                    prevpath = path
+                    if unwrap or not isinstance(sub, types):
+                        ret.append(sub)
+                    else:
+                        ret.append(self._wrap_at(path, sub))
+                    continue
 
-    __getitem__ = get_any
+            # Missing or non-nested value: get_any() delegates or raises
+            del subs[1:]
+            prevpath = ()
+            ret.append(self.get_any(key, unwrap=unwrap))
+
+        return ret
 
     def pop(self, key, *, delete_parents: bool = False):
         if key == ():
             raise ValueError("May not delete itself")
-        key, rest = self.splitkey(key)
 
-        sub = self._wrap(self._object.__getitem__(key), parent=self)
-        if not rest:
-            return self._object.pop(key)
+        path = self.keypath(key)
+        types = self._types
+        state, owned, sub = self._prepare_write()
+        subs = [sub]
+        for i, head in enumerate(path[:-1]):
+            nextsub = sub[head]
+            if owned is not None and isinstance(nextsub, types):
+                nextsub = _owned_child(sub, head, nextsub, owned)
+            sub = nextsub
+            subs.append(sub)
+            if not isinstance(sub, types):
+                sub = self._nested_other(sub, f"Nested value for {head} has wrong type")
+                with self._track_subtree(state, path[: i + 1], sub):
+                    if isinstance(sub, NestedMKDict):
+                        ret = sub.pop(path[i + 1 :], delete_parents=delete_parents)
+                    else:
+                        ret = sub.pop(path[i + 1 :])
+                break
+        else:
+            ret = sub.pop(path[-1])
+            if state is not None:
+                self._changed(state, path, ret, _MISSING)
 
-        if self._not_recursive_to_others and not isinstance(sub, NestedMKDict):
-            raise TypeError(f"Nested value for {key} has wrong type")
+        if delete_parents:
+            for i in range(len(subs) - 1, 0, -1):
+                if subs[i]:
+                    break
+                del subs[i - 1][path[i - 1]]
 
-        ret = sub.pop(rest, delete_parents=delete_parents)
-        if delete_parents and not sub:
-            del self._object[key]
         return ret
 
     def delete_with_parents(self, key):
@@ -324,98 +823,215 @@ class NestedMKDict(ClassWrapper):
     def __delitem__(self, key):
         if key == ():
             raise ValueError("May not delete itself")
-        key, rest = self.splitkey(key)
-
-        if not rest:
-            del self._object[key]
-            return
-
-        if key not in self:
-            raise KeyError(key)
 
-        sub = self._wrap(self._object.__getitem__(key), parent=self)
-        if isinstance(sub, NestedMKDict):
-            sub.__delitem__(rest)
-            return
+        path = self.keypath(key)
+        types = self._types
+        state, owned, sub = self._prepare_write()
+        for i, head in enumerate(path[:-1]):
+            try:
+                nextsub = sub[head]
+            except KeyError as e:
+                raise KeyError(key) from e
 
-        if self._not_recursive_to_others:
-            raise TypeError(f"Nested value for {key} (sub: {rest}) has wrong type")
+            if owned is not None and isinstance(nextsub, types):
+                nextsub = _owned_child(sub, head, nextsub, owned)
+            sub = nextsub
+            if not isinstance(sub, types):
+                sub = self._nested_other(
+                    sub, f"Nested value for {head} (sub: {path[i + 1 :]}) has wrong type"
+                )
+                with self._track_subtree(state, path[: i + 1], sub):
+                    del sub[path[i + 1 :]]
+                return
 
-        sub.__delitem__(rest)
+        if state is None:
+            del sub[path[-1]]
+        else:
+            self._changed(state, path, sub.pop(path[-1]), _MISSING)
 
     def setdefault(self, key, value) -> Any:
-        key, rest = self.splitkey(key)
-
-        if not rest:
-            ret = self._object.setdefault(key, value)
-            return self._wrap(ret, parent=self)
-
-        if key in self:
-            sub = self._wrap(self._object.get(key), parent=self)
+        path = self.keypath(key)
+        types = self._types
+        state, owned, sub = self._prepare_write()
+        for i, head in enumerate(path[:-1]):
+            nextsub = sub.get(head, _MISSING)
+            if nextsub is _MISSING:
+                nextsub = sub[head] = types()
+                if owned is not None:
+                    owned.add(id(nextsub))
+            elif not isinstance(nextsub, types):
+                nextsub = self._nested_other(
+                    nextsub, f"Nested value for {head} has wrong type"
+                )
+                with self._track_subtree(state, path[: i + 1], nextsub):
+                    return nextsub.setdefault(path[i + 1 :], value)
+            elif owned is not None:
+                nextsub = _owned_child(sub, head, nextsub, owned)
+            sub = nextsub
+
+        if state is None or path[-1] in sub:
+            ret = sub.setdefault(path[-1], value)
         else:
-            sub = self._object[key] = self._types()
-            sub = self._wrap(sub, parent=self)
-            # # cfg._set_parent( self )
-
-        if self._not_recursive_to_others and not isinstance(sub, NestedMKDict):
-            raise TypeError(f"Nested value for {key} has wrong type")
-
-        return sub.setdefault(rest, value)
+            sub[path[-1]] = ret = value
+            self._changed(state, path, _MISSING, value)
+        if isinstance(ret, types):
+            return self._wrap_at(path, ret)
+        return ret
 
     def _set(self, key, value):
-        key, rest = self.splitkey(key)
-
-        if not rest:
-            self._object[key] = value
-            return value
-
-        if key in self:
-            sub = self._wrap(self._object.get(key), parent=self)
+        path = self.keypath(key)
+        types = self._types
+        state, owned, sub = self._prepare_write()
+        for i, head in enumerate(path[:-1]):
+            nextsub = sub.get(head, _MISSING)
+            if nextsub is _MISSING:
+                nextsub = sub[head] = types()
+                if owned is not None:
+                    owned.add(id(nextsub))
+            elif not isinstance(nextsub, types):
+                nextsub = self._nested_other(
+                    nextsub,
+                    f"Nested value for {head} (sub: {path[i + 1 :]}) has wrong type",
+                )
+                with self._track_subtree(state, path[: i + 1], nextsub):
+                    if isinstance(nextsub, NestedMKDict):
+                        return nextsub._set(path[i + 1 :], value)
+                    return nextsub.__setitem__(path[i + 1 :], value)
+            elif owned is not None:
+                nextsub = _owned_child(sub, head, nextsub, owned)
+            sub = nextsub
+
+        if state is None:
+            sub[path[-1]] = value
         else:
-            sub = self._object[key] = self._types()
-            sub = self._wrap(sub, parent=self)
-            # # cfg._set_parent( self )
-
-        if isinstance(sub, NestedMKDict):
-            return sub._set(rest, value)
-
-        if self._not_recursive_to_others:
-            raise TypeError(f"Nested value for {key} (sub: {rest}) has wrong type")
-
-        return sub.__setitem__(rest, value)
+            old = sub.get(path[-1], _MISSING)
+            sub[path[-1]] = value
+            self._changed(state, path, old, value)
+        return value
 
     def set(self, key, value):
         return self._set(key, value)
 
     __setitem__ = set
 
+    def set_many(
+        self, items: Mapping[KeyLike, Any] | Iterable[tuple[KeyLike, Any]]
+    ) -> Self:
+        """Set the values for many keys at once.
+
+        The dictionaries along the previous key are kept, so each key descends
+        only the part, which differs from the previous key. The keys are not
+        reordered in order to keep the insertion order, the items of
+        walkitems() or of a flat dictionary of a tree are already grouped by
+        the prefix. The observers are notified once.
+        """
+        with self._batch():
+            return self._set_many(items)
+
+    def _set_many(
+        self, items: Mapping[KeyLike, Any] | Iterable[tuple[KeyLike, Any]]
+    ) -> Self:
+        if isinstance(items, Mapping):
+            items = items.items()
+
+        types = self._types
+        state, owned, sub = self._prepare_write()
+        prevpath = ()
+        subs = [sub]
+        for key, value in items:
+            path = self.keypath(key)
+            last = len(path) - 1
+            i = _common_prefix_length(path, prevpath, min(last, len(subs) - 1))
+            del subs[i + 1 :]
+            sub = subs[-1]
+            for head in path[i:last]:
+                nextsub = sub.get(head, _MISSING)
+                if nextsub is _MISSING:
+                    nextsub = sub[head] = types()
+                    if owned is not None:
+                        owned.add(id(nextsub))
+                elif not isinstance(nextsub, types):
+                    break
+                elif owned is not None:
+                    nextsub = _owned_child(sub, head, nextsub, owned)
+                sub = nextsub
+                subs.append(sub)
+            else:
+                if state is None:
+                    sub[path[last]] = value
+                else:
+                    old = sub.get(path[last], _MISSING)
+                    sub[path[last]] = value
+                    self._changed(state, path, old, value)
+                prevpath = path
+                continue
+
+            # Non-nested value: _set() delegates or raises
+            del subs[1:]
+            prevpath = ()
+            self._set(key, value)
+
+        return self
+
     def __contains__(self, key):
         if key == ():
             return True
-        key, rest = self.splitkey(key)
-
-        if key not in self._object:
-            return False
 
-        if rest:
-            sub = self._wrap(self._object.get(key), parent=self)
-
-            if self._not_recursive_to_others and not isinstance(sub, NestedMKDict):
-                raise TypeError(f"Nested value for {key} is not a nested dictionary")
+        path = self.keypath(key)
+        state = self._state
+        if state is not None and (index := state.leafindex) is not None:
+            value = index.get(path, _MISSING)
+            if value is not _MISSING:
+                return True
+
+        types = self._types
+        sub = self._object
+        for i, head in enumerate(path):
+            if i and not isinstance(sub, types):
+                sub = self._nested_other(
+                    sub, f"Nested value for {path[i - 1]} is not a nested dictionary"
+                )
+                return path[i:] in sub
 
-            return rest in sub
+            sub = sub.get(head, _MISSING)
+            if sub is _MISSING:
+                return False
 
         return True
 
     def items(self):
         for k, v in self._object.items():
-            yield k, self._wrap(v, parent=self)
+            yield k, self._wrap(v, parent=self, parent_key=k)
 
     def values(self):
-        for v in self._object.values():
-            yield self._wrap(v, parent=self)
+        for k, v in self._object.items():
+            yield self._wrap(v, parent=self, parent_key=k)
+
+    def _shared_tree(self) -> Self | None:
+        """Return self, if the wrappers of its dictionary should share its tree
+        state: the leaf index, the digests or the observers should track the
+        modifications, made via the wrapper, or the tree shares the
+        dictionaries with a snapshot (copy on write)"""
+        state = self._root()._state
+        if state is None or (state.owned is None and not state.tracks_changes()):
+            return None
+        return self
 
     def copy(self) -> Self:
+        """Shallow copy, sharing the nested dictionaries.
+
+        The modifications of the shared dictionaries via the copy bypass the
+        digests and the observers of the original tree. A ValueError is raised
+        for a tree with the leaf index or sharing the dictionaries with a
+        snapshot, as the copy would make them inconsistent: use snapshot() or
+        deepcopy() instead.
+        """
+        state = self._root()._state
+        if state is not None and (state.leafindex is not None or state.owned is not None):
+            raise ValueError(
+                "May not make a shallow copy of a tree with the leaf index or snapshots,"
+                " use snapshot() or deepcopy()"
+            )
         cls = type(self)
         return cls(
             self.object.copy(),
@@ -424,25 +1040,166 @@ class NestedMKDict(ClassWrapper):
             recursive_to_others=not self._not_recursive_to_others,
         )
 
-    def deepcopy(self) -> Self:
-        cls = type(self)
-        new = cls(
-            self._types(),
-            parent=self._parent,
+    def deepcopy(self, *, copy_arrays: bool = False) -> Self:
+        """Return a copy with all the nested dictionaries copied.
+
+        The leaves are shared with the original, with `copy_arrays` the numpy
+        arrays are copied.
+        """
+        if copy_arrays:
+            from numpy import ndarray
+        else:
+            ndarray = ()
+
+        wrapper_class = self._wrapper_class
+        types = self._types
+        obj = types()
+        stack = [(self._object, obj)]
+        while stack:
+            source, target = stack.pop()
+            for k, v in source.items():
+                if isinstance(v, wrapper_class):
+                    target[k] = newsub = v._types()
+                    stack.append((v._object, newsub))
+                elif isinstance(v, types):
+                    target[k] = newsub = types()
+                    stack.append((v, newsub))
+                elif isinstance(v, ndarray):
+                    target[k] = v.copy()
+                else:
+                    target[k] = v
+
+        new = type(self)(
+            obj,
             sep=self._sep,
             recursive_to_others=not self._not_recursive_to_others,
+            leaf_index=self._state is not None and self._state.leafindex is not None,
         )
-        for k, v in self.items():
-            k = (k,)
-            if isinstance(v, self._wrapper_class):
-                new[k] = v.deepcopy()._object
-            else:
-                new[k] = v
+        new._parent = self._parent
 
-        new._sep = self._sep
+        return new
+
+    def snapshot(self) -> Self:
+        """Return a copy of the tree, which shares all the dictionaries with it.
+
+        Both the snapshot and the original tree replace a shared dictionary by a
+        copy before modifying it (copy on write), so only the dictionaries along
+        the modified key are copied. Taking a snapshot costs O(len(self)) (O(N)
+        if the leaf index is enabled), a modification costs O(depth).
+
+        The dictionary of self is copied, so the dictionaries from the root down
+        to self stay with the original tree, and the wrappers, sharing the tree
+        (see copy()), stay valid. The nested wrappers, obtained before the
+        modification, may still refer to the former dictionaries. The leaves and
+        the values, which handle the rest of the key by themselves (stored
+        NestedMKDict, other mappings), are shared.
+        """
+        root = self._root()
+        if root._state is None:
+            root._state = _TreeState()
+        elif root._state.owned is not None:
+            # the dictionaries down to self may be shared with another snapshot
+            self._prepare_write()
+        owned = {id(self._object)}
+        current = self
+        while current._parent is not None:
+            current = current._parent
+            owned.add(id(current._object))
+        root._state.owned = owned
+
+        new = type(self)(
+            self._object.copy(),
+            sep=self._sep,
+            recursive_to_others=not self._not_recursive_to_others,
+        )
+        new._types = self._types
+        new._state = state = _TreeState()
+        state.owned = {id(new._object)}
+        if (index := root._state.leafindex) is not None:
+            if root is self:
+                state.leafindex = index.copy()
+            else:
+                state.leafindex = dict(_iterindexed(self._object, (), self._types))
 
         return new
 
+    def digest(self, key=()) -> bytes:
+        """Return a stable content digest (blake2b) of the value at key.
+
+        The digests of the nested dictionaries are cached by the root and reset
+        along the key path on modification. The modifications, made bypassing
+        the methods of the tree (including the direct modifications of the
+        stored NestedMKDict values), are not tracked.
+        """
+        from .digest import DigestNode, leaf_digest, tree_digest
+
+        path = self.keypath(key)
+        value = self.get_any(path) if path else self
+        if not isinstance(value, NestedMKDict):
+            return leaf_digest(value)
+        root = self._root()
+        if value._root() is not root:
+            # a stored NestedMKDict
+            return value.digest()
+
+        if root._state is None:
+            root._state = _TreeState()
+        node = root._state.digests
+        if node is None:
+            node = root._state.digests = DigestNode()
+        for head in (self.path + path) if self._parent is not None else path:
+            child = node.children.get(head)
+            if child is None:
+                child = node.children[head] = DigestNode()
+            node = child
+        return tree_digest(value._object, self._types, node)
+
+    def subscribe(self, callback: Callable[[list], Any], prefix: KeyLike = ()) -> tuple:
+        """Call `callback(changes)` on the modifications within the prefix.
+
+        The changes is a list of (path, old, new), path is the full key from
+        the root, old/new are MISSING for the added/removed keys. The changes,
+        made by set_many(), update(), update_missing(), merge() or within
+        batch(), are delivered at once. The prefix matches the changes below
+        it and the replacement of the dictionaries, containing it. Return the
+        handle for unsubscribe(). The modifications, made bypassing the
+        methods of the tree, are not reported.
+        """
+        root = self._root()
+        if root._state is None:
+            root._state = _TreeState()
+        state = root._state
+        if state.observers is None:
+            state.observers = []
+        path = self.keypath(prefix)
+        if self._parent is not None:
+            path = self.path + path
+        handle = (path, callback)
+        state.observers.append(handle)
+        return handle
+
+    def unsubscribe(self, handle: tuple) -> None:
+        state = self._root()._state
+        observers = state.observers if state is not None else None
+        if not observers or not any(h is handle for h in observers):
+            raise ValueError("Unknown observer handle")
+        observers[:] = [h for h in observers if h is not handle]
+        if not observers:
+            state.observers = None
+
+    def batch(self):
+        """Context manager: deliver the changes to the observers at the exit"""
+        root = self._root()
+        if root._state is None:
+            root._state = _TreeState()
+        return root._state.batch()
+
+    def _batch(self):
+        state = self._root()._state
+        if state is None or state.observers is None:
+            return nullcontext()
+        return state.batch()
+
     def flatten(self, sep: str | None = None) -> dict[str, Any]:
         return dict(self.walkjoineditems(sep=sep))
 
@@ -455,42 +1212,64 @@ class NestedMKDict(ClassWrapper):
         maxdepth: int | None = None,
     ):
         v0 = self.get_any(startfromkey)
-        k0 = tuple(self.iterkey(startfromkey))
+        k0 = self.keypath(startfromkey)
 
-        if maxdepth is None:
-            nextdepth = None
-        else:
-            nextdepth = max(maxdepth - len(k0) - 1, 0)
-
-        if maxdepth == 0 or not isinstance(v0, self._wrapper_class):
+        wrapper_class = self._wrapper_class
+        if maxdepth == 0 or not isinstance(v0, wrapper_class):
             if appendstartkey:
                 yield k0, v0
             else:
                 yield (), v0
             return
 
+        # The dictionaries at the depth >= maxlevel (relative to v0) are yielded
+        # as values. The wrappers are kept only if they may be yielded.
+        maxlevel = None if maxdepth is None else maxdepth - len(k0)
         if not appendstartkey:
             k0 = ()
 
-        for k, v in v0.items():
-            k = k0 + (k,)
-            if isinstance(v, self._wrapper_class):
-                if include_dicts:
-                    yield k, v
-                for k1, v1 in v.walkitems(
-                    include_dicts=include_dicts, maxdepth=nextdepth
-                ):
-                    yield k + k1, v1
-            elif not self._not_recursive_to_others and isinstance(v, Mapping):
-                if include_dicts:
-                    yield k, v
-                for k1, v1 in v.items():
-                    if isinstance(k1, tuple):
-                        yield k + k1, v1
+        keepwrappers = include_dicts or maxlevel is not None
+        types = v0._types
+        recursive_to_others = not v0._not_recursive_to_others
+
+        stack = [(k0, iter(v0._object.items()), v0)]
+        while stack:
+            k0, iterator, parent = stack[-1]
+            level = len(stack)
+            for k, v in iterator:
+                k = k0 + (k,)
+                if isinstance(v, types):
+                    if keepwrappers:
+                        v = wrapper_class(v, parent=parent, parent_key=k[-1])
+                        if include_dicts:
+                            yield k, v
+                        if maxlevel is not None and level >= maxlevel:
+                            yield k, v
+                            continue
+                        stack.append((k, iter(v._object.items()), v))
                     else:
-                        yield k + (k1,), v1
+                        stack.append((k, iter(v.items()), None))
+                    break
+                elif isinstance(v, wrapper_class):
+                    if include_dicts:
+                        yield k, v
+                    nextdepth = None if maxlevel is None else max(maxlevel - level, 0)
+                    for k1, v1 in v.walkitems(
+                        include_dicts=include_dicts, maxdepth=nextdepth
+                    ):
+                        yield k + k1, v1
+                elif recursive_to_others and isinstance(v, Mapping):
+                    if include_dicts:
+                        yield k, v
+                    for k1, v1 in v.items():
+                        if isinstance(k1, tuple):
+                            yield k + k1, v1
+                        else:
+                            yield k + (k1,), v1
+                else:
+                    yield k, v
             else:
-                yield k, v
+                stack.pop()
 
     def walkdicts(self, *, yieldself=False, ignorekeys: Sequence = ()):
         for k, v in self.items():
@@ -572,30 +1351,142 @@ class NestedMKDict(ClassWrapper):
 
         return visitor
 
-    def update(self, other) -> Self:
-        other = self._wrap(other)
-        for k, v in other.walkitems():
-            self[k] = v
-        return self
+    def merge(self, other, *, missing_only: bool = False) -> ChangeSet:
+        """Set the leaves of `other` and return the change set.
 
-    __ior__ = update
+        Both trees are descended together: the nested dictionaries, present in
+        both, are merged in a single pass, the missing ones are created, so the
+        cost is proportional to the size of `other`. With `missing_only`, a
+        TypeError is raised for the keys, already present in self. The
+        observers are notified once.
+        """
+        with self._batch():
+            return self._merge(other, missing_only)
 
-    def update_missing(self, other) -> Self:
+    def _merge(self, other, missing_only: bool) -> ChangeSet:
         other = self._wrap(other)
-        for k, v in other.walkitems():
+        changes = ChangeSet()
+        types = self._types
+        other_types = other._types
+        recursive_other = not other._not_recursive_to_others
+        state, owned, sub = self._prepare_write()
+        if state is not None and not state.tracks_changes():
+            state = None
+        prefix = self.path if state is not None and self._parent is not None else ()
+
+        sep = self._sep
+        # (path, iterator over other, target dictionary, created by the merge)
+        stack = [((), iter(other._object.items()), sub, False)]
+        while stack:
+            path, iterator, target, created = stack[-1]
+            for k, v in iterator:
+                key = path + (k,)
+                if not _plain_part(k, sep):
+                    # the key is split by sep or is a sequence: set the leaves
+                    # key by key, as for the full keys
+                    if isinstance(v, (other_types, NestedMKDict)) or (
+                        recursive_other and isinstance(v, Mapping)
+                    ):
+                        leaves = _iterother(v, other_types)
+                    else:
+                        leaves = (((), v),)
+                    self._merge_leaves(key, leaves, changes, missing_only)
+                    continue
+                old = target.get(k, _MISSING)
+                if isinstance(v, other_types):
+                    if old is _MISSING:
+                        old = target[k] = types()
+                        if owned is not None:
+                            owned.add(id(old))
+                        stack.append((key, iter(v.items()), old, True))
+                        break
+                    if isinstance(old, types):
+                        if owned is not None:
+                            old = _owned_child(target, k, old, owned)
+                        stack.append((key, iter(v.items()), old, False))
+                        break
+                    # a value, handling the rest of the key by itself, or an error
+                    self._merge_leaves(key, _iterother(v, other_types), changes, missing_only)
+                elif isinstance(v, NestedMKDict) or (
+                    recursive_other and isinstance(v, Mapping)
+                ):
+                    self._merge_leaves(key, _iterother(v, other_types), changes, missing_only)
+                elif old is _MISSING:
+                    target[k] = v
+                    changes.added.append(key)
+                    if state is not None:
+                        state.changed(prefix + key, _MISSING, v, types)
+                elif missing_only:
+                    raise TypeError(f"Key {key} already present")
+                elif not isinstance(old, types) and _same_leaf(old, v):
+                    changes.unchanged.append(key)
+                else:
+                    target[k] = v
+                    changes.replaced.append(key)
+                    if state is not None:
+                        state.changed(prefix + key, old, v, types)
+            else:
+                stack.pop()
+                if created and not target:
+                    # no leaves to create the dictionary for
+                    del stack[-1][2][path[-1]]
+
+        return changes
+
+    def _merge_leaves(
+        self,
+        key: tuple,
+        items: Iterable[tuple[tuple, Any]],
+        changes: ChangeSet,
+        missing_only: bool,
+    ) -> None:
+        """Merge the leaves of a value via _set(), key by key"""
+        for k, v in items:
+            k = self.keypath(key + k)
             try:
-                key_already_present = k in self
+                old = self.get(k, _MISSING)
+            except KeyError:
+                # a missing nested dictionary along the key
+                old = _MISSING
             except TypeError:
-                raise TypeError(f"Value for part({k}) is non nestable")
+                if missing_only:
+                    raise TypeError(f"Value for part({k}) is non nestable")
+                old = _MISSING
+            if old is _MISSING:
+                self._set(k, v)
+                changes.added.append(k)
+            elif missing_only:
+                raise TypeError(f"Key {k} already present")
+            elif not isinstance(old, NestedMKDict) and _same_leaf(old, v):
+                changes.unchanged.append(k)
             else:
-                if key_already_present:
-                    raise TypeError(f"Key {k} already present")
-            self[k] = v
+                self._set(k, v)
+                changes.replaced.append(k)
+
+    def update(self, other) -> Self:
+        self.merge(other)
+        return self
+
+    __ior__ = update
+
+    def update_missing(self, other) -> Self:
+        self.merge(other, missing_only=True)
         return self
 
     __ixor__ = update_missing
 
 
+def _iterother(obj: Any, types) -> Generator[tuple[tuple, Any], None, None]:
+    """Yield the leaves of a nested value of the merged tree"""
+    if isinstance(obj, NestedMKDict):
+        yield from obj.walkitems()
+    elif isinstance(obj, types):
+        yield from _iterleaves(obj, (), types)
+    else:
+        for k, v in obj.items():
+            yield (k if isinstance(k, tuple) else (k,)), v
+
+
 def walkitems(obj: NestedMKDict | Any, *args, **kwargs):
     if isinstance(obj, NestedMKDict):
         yield from obj.walkitems(*args, **kwargs)
@@ -615,3 +1506,96 @@ def walkkeys(obj: NestedMKDict | Any, *args, **kwargs):
         yield from obj.walkkeys(*args, **kwargs)
     else:
         yield ()
+
+
+_LOOKUP = object()
+
+
+def zipwalkitems(
+    arg0: NestedMKDict,
+    *args: NestedMKDict,
+    missing: str = "error",
+    fillvalue: Any = None,
+) -> Generator[tuple[tuple, tuple], None, None]:
+    """Walk the leaves of `arg0` together with the values for the same keys in `args`.
+
+    Yields (key, (value0, value1, ...)) in the order of `arg0.walkitems()`. The
+    trees are descended together, each shared nested dictionary is entered once.
+    The keys, missing in any of `args`, are handled according to `missing`:
+    "error" (raise KeyError), "skip" (do not yield the key) or "fill" (use
+    `fillvalue`).
+    """
+    if missing not in ("error", "skip", "fill"):
+        raise ValueError(f"Invalid missing mode: {missing}")
+    types0 = arg0._types
+    recursive_to_others = not arg0._not_recursive_to_others
+    argtypes = tuple(arg._types for arg in args)
+
+    stack = [((), iter(arg0._object.items()), tuple(arg._object for arg in args))]
+    while stack:
+        k0, iterator, nodes = stack[-1]
+        for k, v in iterator:
+            key = k0 + (k,)
+            subnodes = tuple(
+                _zip_child(node, k, types) for node, types in zip(nodes, argtypes)
+            )
+            if isinstance(v, NestedMKDict):
+                v = v._object
+            if isinstance(v, types0):
+                stack.append((key, iter(v.items()), subnodes))
+                break
+
+            if recursive_to_others and isinstance(v, Mapping):
+                lookups = (_LOOKUP,) * len(args)
+                for k1, v1 in v.items():
+                    subkey = key + (k1 if isinstance(k1, tuple) else (k1,))
+                    values = _zip_lookup(subkey, args, lookups, missing, fillvalue)
+                    if values is not None:
+                        yield subkey, (v1, *values)
+                continue
+
+            values = _zip_lookup(key, args, subnodes, missing, fillvalue)
+            if values is not None:
+                yield key, (v, *values)
+        else:
+            stack.pop()
+
+
+def _zip_child(node: Any, key: Any, types: tuple) -> Any:
+    """The child of the plain dictionary node, _MISSING or _LOOKUP, when the
+    node is not a plain dictionary and the value should be looked up by the
+    full key"""
+    if node is _MISSING or node is _LOOKUP:
+        return node
+    if isinstance(node, types):
+        ret = node.get(key, _MISSING)
+        if isinstance(ret, NestedMKDict):
+            return ret._object
+        return ret
+    return _LOOKUP
+
+
+def _zip_lookup(
+    key: tuple, args: tuple, nodes: tuple, missing: str, fillvalue: Any
+) -> tuple | None:
+    """The values of args for the key, None if the key should be skipped"""
+    values = []
+    for arg, node in zip(args, nodes):
+        if node is _LOOKUP or isinstance(node, arg._types):
+            # The value is a nested dictionary to be wrapped, or it is
+            # to be found by a foreign mapping
+            try:
+                node = arg.get_any(key)
+            except KeyError:
+                if missing == "error":
+                    raise
+                node = _MISSING
+
+        if node is _MISSING:
+            if missing == "error":
+                raise KeyError(f"No nested key '{key}'")
+            if missing == "skip":
+                return None
+            node = fillvalue
+        values.append(node)
+    return tuple(values)
@@ -1,4 +1,13 @@
 from .filter import filter_items
-from .map import remap_items, mkmap
+from .map import iter_remap_items, remap_items, mkmap
 from .match import match_keys
 from .reorder_key import reorder_key
+from .stream import (
+    dump_csv,
+    dump_jsonl,
+    dump_records,
+    load_csv,
+    load_jsonl,
+    load_records,
+)
+from .diff import Patch, apply_patch, diff
@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from ..nestedmkdict import NestedMKDict
+
+if TYPE_CHECKING:
+    from collections.abc import Generator, Mapping
+    from typing import Any, Self
+
+_MISSING = object()
+
+
+class Patch:
+    """The difference between two nested dictionaries, leaf by leaf.
+
+    added: {key: new value} for the leaves, missing in the first tree
+    removed: {key: old value} for the leaves, missing in the second tree
+    replaced: {key: (old value, new value)} for the leaves with different values
+
+    A leaf, replaced by a nested dictionary (or vice versa), is removed and the
+    leaves of the dictionary are added.
+    """
+
+    __slots__ = ("added", "removed", "replaced")
+    added: dict[tuple, Any]
+    removed: dict[tuple, Any]
+    replaced: dict[tuple, tuple[Any, Any]]
+
+    def __init__(self):
+        self.added = {}
+        self.removed = {}
+        self.replaced = {}
+
+    def __len__(self) -> int:
+        return len(self.added) + len(self.removed) + len(self.replaced)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.replaced)
+
+    def __repr__(self):
+        return (
+            f"Patch(added={len(self.added)}, removed={len(self.removed)},"
+            f" replaced={len(self.replaced)})"
+        )
+
+    def inverted(self) -> Self:
+        """The patch, which reverts this one"""
+        ret = type(self)()
+        ret.added = self.removed.copy()
+        ret.removed = self.added.copy()
+        ret.replaced = {key: (new, old) for key, (old, new) in self.replaced.items()}
+        return ret
+
+
+def diff(a: NestedMKDict | Mapping, b: NestedMKDict | Mapping) -> Patch:
+    """Return the patch, which turns the leaves of `a` into the leaves of `b`.
+
+    Both trees are walked together. The nested dictionaries, which are the
+    same object (e.g. shared by a snapshot), are skipped, so the cost is
+    proportional to the size of the difference and the number of the distinct
+    dictionaries on the way to it. The cached digests (see NestedMKDict.digest())
+    are not used: they miss the changes, made to the stored dictionaries directly.
+    """
+    if not isinstance(a, NestedMKDict):
+        a = NestedMKDict(a)
+    if not isinstance(b, NestedMKDict):
+        b = NestedMKDict(b)
+    types = (a._types, b._types)
+    patch = Patch()
+    added = patch.added
+    removed = patch.removed
+
+    stack = [((), a._object, b._object)]
+    while stack:
+        path, suba, subb = stack.pop()
+        for k, va in suba.items():
+            key = path + (k,)
+            vb = subb.get(k, _MISSING)
+            if va is vb:
+                continue
+            if vb is _MISSING:
+                removed.update(_leaves(key, va, types))
+                continue
+            nesteda = _nested(va, types)
+            nestedb = _nested(vb, types)
+            if nesteda is not None and nestedb is not None:
+                if nesteda is not nestedb:
+                    stack.append((key, nesteda, nestedb))
+            elif nesteda is None and nestedb is None:
+                if not _equal(va, vb):
+                    patch.replaced[key] = (va, vb)
+            else:
+                removed.update(_leaves(key, va, types))
+                added.update(_leaves(key, vb, types))
+        for k, vb in subb.items():
+            if k not in suba:
+                added.update(_leaves(path + (k,), vb, types))
+
+    return patch
+
+
+def apply_patch(tree: NestedMKDict, patch: Patch) -> NestedMKDict:
+    """Apply the patch, made by diff(), to the tree in place and return it.
+    The nested dictionaries, left empty by the removal, are deleted."""
+    for key in patch.removed:
+        tree.pop(key, delete_parents=True)
+    tree.set_many((key, new) for key, (_, new) in patch.replaced.items())
+    tree.set_many(patch.added)
+    return tree
+
+
+def _nested(value: Any, types: tuple) -> Any:
+    """The plain dictionary of a nested value, or None for a leaf"""
+    if isinstance(value, NestedMKDict):
+        return value._object
+    if isinstance(value, types):
+        return value
+    return None
+
+
+def _leaves(key: tuple, value: Any, types: tuple) -> Generator[tuple[tuple, Any], None, None]:
+    dct = _nested(value, types)
+    if dct is None:
+        yield key, value
+        return
+    stack = [(key, iter(dct.items()))]
+    while stack:
+        prefix, iterator = stack[-1]
+        for k, v in iterator:
+            sub = _nested(v, types)
+            if sub is not None:
+                stack.append((prefix + (k,), iter(sub.items())))
+                break
+            yield prefix + (k,), v
+        else:
+            stack.pop()
+
+
+def _equal(a: Any, b: Any) -> bool:
+    """Compare the leaves, the numpy arrays are compared elementwise"""
+    try:
+        eq = a == b
+    except Exception:
+        return False
+    if eq.__class__ is bool:
+        return eq
+    if getattr(a, "shape", None) != getattr(b, "shape", None):
+        return False
+    try:
+        return bool(eq.all())
+    except Exception:
+        return False
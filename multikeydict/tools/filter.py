@@ -26,9 +26,5 @@ def mkfilter_items(
     mkdict: NestedMKDict, exclude: Sequence[Sequence[str] | str]
 ) -> NestedMKDict:
     ret = mkdict.__class__({}, sep=mkdict._sep)
-
-    for key, value in filter_items(mkdict.walkitems(), exclude):
-        ret[key] = value
-
-    return ret
+    return ret.set_many(filter_items(mkdict.walkitems(), exclude))
 
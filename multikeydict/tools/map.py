@@ -1,12 +1,18 @@
 from __future__ import annotations
 
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from operator import itemgetter
 from typing import TYPE_CHECKING
 
-from ..nestedmkdict import NestedMKDict
+from ..nestedmkdict import NestedMKDict, zipwalkitems
 from ..typing import setkey
 
 if TYPE_CHECKING:
-    from collections.abc import Callable, Mapping, Sequence
+    from collections.abc import Callable, Generator, Iterable, Mapping, Sequence
+    from concurrent.futures import Executor
     from typing import Any
 
     from ..typing import Key, KeyLike
@@ -17,7 +23,27 @@ def mkmap(
     arg0: NestedMKDict,
     *args: NestedMKDict,
     sep: int | str | bool | None = None,
+    executor: Executor | None = None,
+    workers: int | None = None,
+    chunksize: int | None = None,
+    missing: str = "error",
+    fillvalue: Any = None,
 ) -> NestedMKDict:
+    """Apply `fcn` to the leaves of `arg0` and the matching leaves of `args`.
+
+    For ColumnarMKDict arguments a numpy ufunc is applied to the whole arrays
+    and ColumnarMKDict is returned. The trees are walked together, see
+    `zipwalkitems()`. The keys, missing in
+    `args`, are handled according to `missing`: "error", "skip" or "fill" (pass
+    `fillvalue`).
+
+    With `executor` (e.g. ThreadPoolExecutor or ProcessPoolExecutor) or
+    `workers` (a ThreadPoolExecutor is created), the leaves are processed in
+    chunks of `chunksize` in parallel. The result keeps the order of `arg0`.
+    The exception, raised by `fcn`, gets a note with the leaf key and, unless
+    it is already set (e.g. by a nested mkmap()), the `mkmap_key` attribute.
+    The own attributes of the exception are not modified.
+    """
     match sep:
         case False:
             # False matches case 0, but 0 does not match case False
@@ -35,13 +61,80 @@ def mkmap(
             pass
         case _:
             raise TypeError(f"Invalid sep: {sep}")
+    if _has_columnar(arg0, args):
+        from numpy import ufunc
+
+        from ..columnarmkdict import ColumnarMKDict
+
+        if isinstance(fcn, ufunc):
+            # vectorized
+            ret = fcn(arg0, *args)
+            if isinstance(ret, ColumnarMKDict):
+                ret._sep = sep
+            return ret
+        arg0, *args = (
+            arg.to_nested() if isinstance(arg, ColumnarMKDict) else arg
+            for arg in (arg0, *args)
+        )
+
     ret = NestedMKDict({}, sep=sep)
-    for key, value0 in arg0.walkitems():
-        values = (arg[key] for arg in args)
-        ret[key] = fcn(value0, *values)
+    keyedargs = zipwalkitems(arg0, *args, missing=missing, fillvalue=fillvalue)
+    if executor is None and workers is None:
+        ret.set_many(_apply_keyed(fcn, keyedargs))
+        return ret
+
+    keyedargs = list(keyedargs)
+    if chunksize is None:
+        chunksize = max(1, -(-len(keyedargs) // (4 * (workers or os.cpu_count() or 1))))
+    elif chunksize < 1:
+        raise ValueError(f"Invalid chunksize: {chunksize}")
+    chunks = [keyedargs[i : i + chunksize] for i in range(0, len(keyedargs), chunksize)]
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(_apply_chunk, fcn, chunk) for chunk in chunks]
+        try:
+            for future in futures:
+                ret.set_many(future.result())
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    finally:
+        if own_executor:
+            executor.shutdown()
     return ret
 
 
+def _has_columnar(arg0: Any, args: tuple) -> bool:
+    """Check for ColumnarMKDict without importing numpy"""
+    columnarmkdict = sys.modules.get(f"{__package__.rpartition('.')[0]}.columnarmkdict")
+    if columnarmkdict is None:
+        return False
+    return any(isinstance(arg, columnarmkdict.ColumnarMKDict) for arg in (arg0, *args))
+
+
+def _apply_keyed(
+    fcn: Callable, keyedargs: Iterable[tuple[Key, tuple]]
+) -> Generator[tuple[Key, Any], None, None]:
+    for key, fcnargs in keyedargs:
+        try:
+            value = fcn(*fcnargs)
+        except Exception as error:
+            if not hasattr(error, "mkmap_key"):
+                with suppress(AttributeError):
+                    error.mkmap_key = key
+            error.add_note(f"mkmap: failed for key {key}")
+            raise
+        yield key, value
+
+
+def _apply_chunk(fcn: Callable, keyedargs: list[tuple[Key, tuple]]) -> list[tuple[Key, Any]]:
+    return list(_apply_keyed(fcn, keyedargs))
+
+
 def remap_items(
     source: NestedMKDict,
     target: NestedMKDict | None = None,
@@ -60,11 +153,61 @@ def remap_items(
     fcn: Callable[[Any], Any] | None = None,
     verbose: bool = False,
 ) -> NestedMKDict:
-    from itertools import product
+    """Write the items of `source` to `target` with renamed and reordered keys.
 
+    See `iter_remap_items()`. The items are inserted with `target.set_many()`,
+    if the target provides it.
+    """
     if target is None:
         target = NestedMKDict()
 
+    items = iter_remap_items(
+        source,
+        rename_indices=rename_indices,
+        reorder_indices=reorder_indices,
+        skip_indices_source=skip_indices_source,
+        skip_indices_target=skip_indices_target,
+        fcn=fcn,
+        verbose=verbose,
+    )
+    set_many = getattr(target, "set_many", None)
+    if set_many is not None:
+        set_many(items)
+    else:
+        for key, value in items:
+            target[key] = value
+
+    return target
+
+
+def iter_remap_items(
+    source: NestedMKDict,
+    *,
+    rename_indices: Mapping[str, Sequence[str]] | None = None,
+    reorder_indices: (
+        tuple[int]
+        | tuple[tuple[str, ...], tuple[str, ...]]
+        | list[int]
+        | list[list[str]]
+        | Mapping[str, list[str] | tuple[str]]
+        | None
+    ) = None,
+    skip_indices_source: Sequence[KeyLike | set] | None = None,
+    skip_indices_target: Sequence[KeyLike | set] | None = None,
+    fcn: Callable[[Any], Any] | None = None,
+    verbose: bool = False,
+) -> Generator[tuple[Key, Any], None, None]:
+    """Yield the items of `source` with renamed and reordered keys.
+
+    Each key part is replaced by each of its `rename_indices` alternatives
+    (cartesian product), then the parts are reordered by `reorder_indices`.
+    The source keys containing any of `skip_indices_source` and the target keys
+    containing any of `skip_indices_target` are skipped. Unless `verbose`, the
+    skipped targets are pruned before the product is expanded, given the
+    reorder keeps each part of the key once.
+    """
+    from itertools import product
+
     skip_source = _make_skip_fcn(skip_indices_source)
     skip_target = _make_skip_fcn(skip_indices_target)
     reorder = make_reorder_function(reorder_indices)
@@ -75,7 +218,21 @@ def remap_items(
     else:
         has_fcn = True
 
-    if rename_indices is not None:
+    if rename_indices is None:
+        for key, value in source.walkitems():
+            newkey_ordered = reorder(key)
+            if skip_target(newkey_ordered):
+                if verbose:
+                    print(f"remap: skip {'.'.join(key)} → {'.'.join(newkey_ordered)}")
+                continue
+            if verbose:
+                print(
+                    f"remap {'(fcn) ' if has_fcn else ''}{'.'.join(key)} → {'.'.join(newkey_ordered)}"
+                )
+            yield newkey_ordered, fcn(value)
+        return
+
+    if verbose:
         for key, value in source.walkitems():
             if skip_source(key):
                 continue
@@ -84,39 +241,86 @@ def remap_items(
             ):
                 newkey_ordered = reorder(newkey)
                 if skip_target(newkey_ordered):
-                    if verbose:
-                        print(
-                            f"remap: skip {'.'.join(key)} → {'.'.join(newkey_ordered)}"
-                        )
-                    continue
-                if verbose:
-                    print(
-                        f"remap {'(fcn) ' if has_fcn else ''}{'.'.join(key)} → {'.'.join(newkey_ordered)}"
-                    )
-                target[newkey_ordered] = fcn(value)
-    else:
-        for key, value in source.walkitems():
-            newkey_ordered = reorder(key)
-            if skip_target(newkey_ordered):
-                if verbose:
                     print(f"remap: skip {'.'.join(key)} → {'.'.join(newkey_ordered)}")
-                continue
-            if verbose:
+                    continue
                 print(
                     f"remap {'(fcn) ' if has_fcn else ''}{'.'.join(key)} → {'.'.join(newkey_ordered)}"
                 )
-            target[newkey_ordered] = fcn(value)
+                yield newkey_ordered, fcn(value)
+        return
+
+    renames = {skey: tuple(alternatives) for skey, alternatives in rename_indices.items()}
+    skip_sets_target = _make_skip_sets(skip_indices_target)
+    # key length -> whether the reorder keeps each part once, so the target key
+    # is checked before the reorder
+    permutation = {}
+    for key, value in source.walkitems():
+        if skip_source(key):
+            continue
+        alternatives = [renames.get(skey, (skey,)) for skey in key]
+        length = len(key)
+        if (permutes := permutation.get(length)) is None:
+            indices = tuple(range(length))
+            permutes = permutation[length] = sorted(reorder(indices)) == list(indices)
+        if not permutes:
+            for newkey in product(*alternatives):
+                newkey_ordered = reorder(newkey)
+                if not skip_target(newkey_ordered):
+                    yield newkey_ordered, fcn(value)
+            continue
+        alternatives, skip_sets = _prune_alternatives(alternatives, skip_sets_target)
+        if alternatives is None:
+            continue
+        for newkey in product(*alternatives):
+            if skip_sets and any(ss.issubset(newkey) for ss in skip_sets):
+                continue
+            yield reorder(newkey), fcn(value)
 
-    return target
+
+def _prune_alternatives(
+    alternatives: list[tuple], skip_sets: tuple[set, ...]
+) -> tuple[list[tuple] | None, list[set]]:
+    """Remove the alternatives, which lead only to the skipped keys.
+
+    The parts with a single alternative are always present: if a skip set
+    misses only one part, the part is removed from the alternatives. Return
+    None if all the keys are skipped, and the skip sets to check per key.
+    """
+    while skip_sets:
+        fixed = {alts[0] for alts in alternatives if len(alts) == 1}
+        drop = set()
+        rest = []
+        for ss in skip_sets:
+            remaining = ss - fixed
+            if not remaining:
+                return None, []
+            if len(remaining) == 1:
+                drop |= remaining
+            else:
+                rest.append(ss)
+        if not drop:
+            break
+        alternatives = [
+            tuple(alt for alt in alts if alt not in drop) for alts in alternatives
+        ]
+        if not all(alternatives):
+            return None, []
+        skip_sets = rest
+
+    return alternatives, list(skip_sets)
+
+
+def _make_skip_sets(skip_indices: Sequence[KeyLike | set] | None) -> tuple[set, ...]:
+    if skip_indices is None:
+        return ()
+    return tuple(sq if isinstance(sq, set) else setkey(sq) for sq in skip_indices)
 
 
 def _make_skip_fcn(
     skip_indices: Sequence[KeyLike | set] | None,
 ) -> Callable[[Key], bool]:
     if skip_indices is not None:
-        skip_sets: tuple[set[str], ...] = tuple(
-            sq if isinstance(sq, set) else setkey(sq) for sq in skip_indices
-        )
+        skip_sets = _make_skip_sets(skip_indices)
         return lambda key: any(ss.issubset(key) for ss in skip_sets)
 
     return lambda _: False
@@ -157,11 +361,15 @@ def make_reorder_function(
         case _:
             raise ValueError(f"Invalid order specification: {reorder_indices}")
 
+    getter = itemgetter(*index_order)
+    single = len(index_order) == 1
+
     def reorder_indices(key: Sequence):
         if not allow_skip_items and len(key) != len_from:
             raise ValueError(
                 f"inconsistent index length: {len(index_order)} vs required {len(key)}"
             )
-        return key.__class__(key[idx] for idx in index_order)
+        ret = (getter(key),) if single else getter(key)
+        return ret if key.__class__ is tuple else key.__class__(ret)
 
     return reorder_indices
@@ -56,37 +56,51 @@ def match_keys(
         require_all_left_keys_processed or skippable_left_keys_should_contain
     )
 
+    if fcn_skip is None:
+        # Nothing is reported for the skipped pairs: select the consistent left
+        # keys via the index, the skipped left keys are found at the end
+        index = _LeftKeysIndex(
+            keys_left_seq, left_in_right=left_in_right, right_in_left=right_in_left
+        )
+        iter_matches = index.match
+    else:
+
+        def iter_matches(key_right_proper: TupleKey):
+            setkey_right = OrderedSet(key_right_proper)
+            for i_left, keys_left in enumerate(keys_left_seq):
+                for key_left in keys_left:
+                    if key_left:
+                        key_left_proper = properkey(key_left)
+                        setkey_left = OrderedSet(key_left_proper)
+                        if not keys_consistent(setkey_left, setkey_right):
+                            if (
+                                collect_skipped_left_keys
+                                and key_left_proper not in processed_left_keys
+                            ):
+                                skipped_left_keys.add(key_left_proper)
+                            fcn_skip(i_left, key_left_proper, key_right_proper)
+                            continue
+                    else:
+                        key_left_proper = ()
+
+                    yield i_left, key_left_proper
+
+    has_right_keys = False
     for key_right in keys_right:
+        has_right_keys = True
         key_right_proper = properkey(key_right)
-        setkey_right = OrderedSet(key_right_proper)
         if fcn_outer_before is not None:
             fcn_outer_before(key_right_proper)
 
         right_processed = False
-        for i_left, keys_left in enumerate(keys_left_seq):
-            for key_left in keys_left:
-                if key_left:
-                    key_left_proper = properkey(key_left)
-                    setkey_left = OrderedSet(key_left_proper)
-                    if not keys_consistent(setkey_left, setkey_right):
-                        if (
-                            collect_skipped_left_keys
-                            and key_left_proper not in processed_left_keys
-                        ):
-                            skipped_left_keys.add(key_left_proper)
-                        if fcn_skip:
-                            fcn_skip(i_left, key_left_proper, key_right_proper)
-                        continue
-                else:
-                    key_left_proper = ()
-
-                fcn(i_left, key_left_proper, key_right_proper)
-                right_processed = True
+        for i_left, key_left_proper in iter_matches(key_right_proper):
+            fcn(i_left, key_left_proper, key_right_proper)
+            right_processed = True
 
-                if collect_skipped_left_keys:
-                    with suppress(KeyError):
-                        skipped_left_keys.remove(key_left_proper)
-                    processed_left_keys.add(key_left_proper)
+            if collect_skipped_left_keys:
+                with suppress(KeyError):
+                    skipped_left_keys.remove(key_left_proper)
+                processed_left_keys.add(key_left_proper)
 
         if fcn_outer_after is not None:
             fcn_outer_after(key_right_proper)
@@ -94,6 +108,9 @@ def match_keys(
         if not right_processed:
             skipped_right_keys.append(key_right_proper)
 
+    if fcn_skip is None and collect_skipped_left_keys and has_right_keys:
+        skipped_left_keys = index.keys - processed_left_keys
+
     if skipped_left_keys:
         if require_all_left_keys_processed:
             raise ValueError(
@@ -126,3 +143,87 @@ def _check_skipped_keys_incorrect(
             return True, skipped_key
 
     return False, None
+
+
+class _LeftKeysIndex:
+    """
+    The left keys of `match_keys` with an inverted index from key part to the
+    left keys, containing it. The matches for a right key are found via the
+    posting lists: union with counting for left ⊆ right and intersection for
+    right ⊆ left.
+    """
+
+    __slots__ = ("entries", "always", "postings", "keys", "left_in_right", "right_in_left")
+    # (i_left, key_left_proper, number of unique parts) in the order of iteration
+    entries: list[tuple[int, TupleKey, int]]
+    # the empty left keys, matching any right key
+    always: list[int]
+    postings: dict[Any, list[int]]
+    # the non-empty left keys
+    keys: set[TupleKey]
+
+    def __init__(
+        self,
+        keys_left_seq: Sequence[Sequence[KeyLike]],
+        *,
+        left_in_right: bool,
+        right_in_left: bool,
+    ):
+        self.left_in_right = left_in_right
+        self.right_in_left = right_in_left
+        self.entries = entries = []
+        self.always = []
+        self.postings = postings = {}
+        self.keys = set()
+        for i_left, keys_left in enumerate(keys_left_seq):
+            for key_left in keys_left:
+                n = len(entries)
+                if not key_left:
+                    entries.append((i_left, (), 0))
+                    self.always.append(n)
+                    continue
+
+                key_left_proper = properkey(key_left)
+                parts = set(key_left_proper)
+                entries.append((i_left, key_left_proper, len(parts)))
+                self.keys.add(key_left_proper)
+                for part in parts:
+                    try:
+                        postings[part].append(n)
+                    except KeyError:
+                        postings[part] = [n]
+
+    def match(self, key_right_proper: TupleKey) -> list[tuple[int, TupleKey]]:
+        """The consistent left keys in the order of iteration"""
+        entries = self.entries
+        postings = self.postings
+        parts = set(key_right_proper)
+        matched = set(self.always)
+
+        if self.left_in_right:
+            counts = {}
+            for part in parts:
+                for n in postings.get(part, ()):
+                    counts[n] = counts.get(n, 0) + 1
+            matched.update(n for n, count in counts.items() if count == entries[n][2])
+
+        if self.right_in_left:
+            if not parts:
+                matched.update(range(len(entries)))
+            else:
+                lists = []
+                for part in parts:
+                    posting = postings.get(part)
+                    if posting is None:
+                        break
+                    lists.append(posting)
+                else:
+                    lists.sort(key=len)
+                    candidates = set(lists[0])
+                    for posting in lists[1:]:
+                        candidates.intersection_update(posting)
+                        if not candidates:
+                            break
+                    matched.update(candidates)
+
+        return [entries[n][:2] for n in sorted(matched)]
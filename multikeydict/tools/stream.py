@@ -0,0 +1,166 @@
+"""Streaming export and import of the leaves of a nested dictionary.
+
+The leaves are written one by one from walkjoineditems(), and read back to
+NestedMKDict.set_many() from a generator, so apart of the tree itself the
+memory is bounded. The joined keys are split back with the same sep.
+
+Formats:
+- JSON Lines: `{"key": "a.b.c", "value": ...}` per line
+- CSV: `key,value` rows, the values are JSON encoded
+- binary records: MAGIC, then per leaf: u32 key length, key (utf-8), u8 tag,
+  u64 payload length, payload (see multikeydict.binary)
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+from struct import Struct
+from typing import TYPE_CHECKING
+
+from ..binary import _decode_leaf, _encode_leaf, _leaf_tag
+from ..nestedmkdict import NestedMKDict
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Generator, Iterable
+    from typing import Any, BinaryIO, TextIO
+
+MAGIC = b"MKDREC\x00\x01"
+_RECORD_HEAD = Struct("<I")
+_RECORD_VALUE = Struct("<BQ")
+
+
+def _load(
+    items: Iterable[tuple[str, Any]], sep: str | None, target: NestedMKDict | None
+) -> NestedMKDict:
+    if sep is None:
+        sep = "."
+    if target is None:
+        target = NestedMKDict({}, sep=sep)
+    elif sep != target._sep:
+        items = ((tuple(key.split(sep)), value) for key, value in items)
+    target.set_many(items)
+    return target
+
+
+def dump_jsonl(
+    tree: NestedMKDict,
+    fileobj: TextIO,
+    *,
+    sep: str | None = None,
+    default: Callable[[Any], Any] | None = None,
+) -> int:
+    """Write the leaves as JSON Lines, return the number of leaves.
+    `default` is passed to json.dumps() for the non-JSON values."""
+    encode = json.JSONEncoder(default=default, ensure_ascii=False).encode
+    count = 0
+    for key, value in tree.walkjoineditems(sep=sep):
+        fileobj.write(encode({"key": key, "value": value}))
+        fileobj.write("\n")
+        count += 1
+    return count
+
+
+def iter_jsonl(fileobj: TextIO) -> Generator[tuple[str, Any], None, None]:
+    for line in fileobj:
+        if line.strip():
+            record = json.loads(line)
+            yield record["key"], record["value"]
+
+
+def load_jsonl(
+    fileobj: TextIO, *, sep: str | None = None, target: NestedMKDict | None = None
+) -> NestedMKDict:
+    """Read the leaves, written by dump_jsonl(), to `target` or a new NestedMKDict"""
+    return _load(iter_jsonl(fileobj), sep, target)
+
+
+def dump_csv(
+    tree: NestedMKDict,
+    fileobj: TextIO,
+    *,
+    sep: str | None = None,
+    header: bool = True,
+    default: Callable[[Any], Any] | None = None,
+    **fmtparams,
+) -> int:
+    """Write the leaves as `key,value` CSV rows with JSON encoded values,
+    return the number of leaves. The file should be opened with newline=''."""
+    encode = json.JSONEncoder(default=default, ensure_ascii=False).encode
+    writer = csv.writer(fileobj, **fmtparams)
+    if header:
+        writer.writerow(("key", "value"))
+    count = 0
+    for key, value in tree.walkjoineditems(sep=sep):
+        writer.writerow((key, encode(value)))
+        count += 1
+    return count
+
+
+def iter_csv(
+    fileobj: TextIO, *, header: bool = True, **fmtparams
+) -> Generator[tuple[str, Any], None, None]:
+    reader = csv.reader(fileobj, **fmtparams)
+    if header:
+        next(reader, None)
+    for row in reader:
+        if not row:
+            continue
+        key, value = row
+        try:
+            value = json.loads(value)
+        except ValueError:
+            # not written by dump_csv(): keep the text
+            pass
+        yield key, value
+
+
+def load_csv(
+    fileobj: TextIO,
+    *,
+    sep: str | None = None,
+    target: NestedMKDict | None = None,
+    header: bool = True,
+    **fmtparams,
+) -> NestedMKDict:
+    """Read the leaves, written by dump_csv(), to `target` or a new NestedMKDict"""
+    return _load(iter_csv(fileobj, header=header, **fmtparams), sep, target)
+
+
+def dump_records(tree: NestedMKDict, fileobj: BinaryIO, *, sep: str | None = None) -> int:
+    """Write the leaves as binary records, return the number of leaves.
+    The numpy arrays are written raw, the other objects are encoded as in
+    multikeydict.binary."""
+    fileobj.write(MAGIC)
+    count = 0
+    for key, value in tree.walkjoineditems(sep=sep):
+        keydata = key.encode()
+        tag = _leaf_tag(value)
+        payload = _encode_leaf(tag, value)
+        fileobj.write(_RECORD_HEAD.pack(len(keydata)))
+        fileobj.write(keydata)
+        fileobj.write(_RECORD_VALUE.pack(tag, len(payload)))
+        fileobj.write(payload)
+        count += 1
+    return count
+
+
+def iter_records(fileobj: BinaryIO) -> Generator[tuple[str, Any], None, None]:
+    if fileobj.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a nested dictionary record stream")
+    while head := fileobj.read(_RECORD_HEAD.size):
+        (keysize,) = _RECORD_HEAD.unpack(head)
+        key = fileobj.read(keysize).decode()
+        tag, size = _RECORD_VALUE.unpack(fileobj.read(_RECORD_VALUE.size))
+        # bytearray: the decoded numpy arrays own a writable buffer
+        payload = bytearray(fileobj.read(size))
+        if len(payload) != size:
+            raise ValueError(f"Truncated record stream at key {key}")
+        yield key, _decode_leaf(tag, memoryview(payload))
+
+
+def load_records(
+    fileobj: BinaryIO, *, sep: str | None = None, target: NestedMKDict | None = None
+) -> NestedMKDict:
+    """Read the leaves, written by dump_records(), to `target` or a new NestedMKDict"""
+    return _load(iter_records(fileobj), sep, target)
@@ -0,0 +1,26 @@
+import numpy as np
+from pytest import fixture
+
+from multikeydict.nestedmkdict import NestedMKDict
+
+
+@fixture
+def mixed_tree():
+    """A tree with the leaves and the keys of various types"""
+    return NestedMKDict(
+        {
+            "a": {"b": 1, "c": {"d": 2.5, "e": "text"}},
+            "f": None,
+            "g": [1, 2, {"x": 3}],
+            "h": {
+                "arr": np.arange(12, dtype="f4").reshape(3, 4),
+                "farr": np.asfortranarray(np.arange(6).reshape(2, 3)),
+                "empty": np.zeros(0),
+                "scalar": np.array(5.0),
+                "npfloat": np.float64(1.5),
+            },
+            "i": {1: True, 2: False, frozenset((3, 4)): 2**70, "bytes": b"\x00\x01"},
+            "j": {},
+        },
+        sep=".",
+    )
@@ -0,0 +1,121 @@
+from collections.abc import ValuesView
+from io import BytesIO
+
+import numpy as np
+from pytest import raises
+
+from multikeydict.binary import LazyDict, dump_mmap, load_mmap, read_tree, write_tree
+from multikeydict.nestedmkdict import NestedMKDict
+
+
+def _check_equal(loaded, tree):
+    keys = list(tree.walkkeys())
+    assert list(loaded.walkkeys()) == keys
+    for key, value in tree.walkitems():
+        other = loaded[key]
+        if isinstance(value, np.ndarray):
+            assert other.dtype == value.dtype
+            assert np.array_equal(other, value)
+        else:
+            assert type(other) is type(value)
+            assert other == value
+
+
+def test_binary_01_mmap(tmp_path, mixed_tree):
+    tree = mixed_tree
+    path = tmp_path / "tree.mkd"
+    dump_mmap(tree, path)
+
+    loaded = load_mmap(path)
+    assert loaded._sep == "."
+    assert isinstance(loaded.object, LazyDict)
+    # only the root is decoded
+    assert dict.__getitem__(loaded.object, "a").__class__.__name__ == "_Pending"
+    assert loaded["a.c.d"] == 2.5
+    assert isinstance(dict.__getitem__(loaded.object, "a"), LazyDict)
+
+    _check_equal(loaded, tree)
+    assert loaded("a").flatten() == tree("a").flatten()
+
+    arr = loaded["h.arr"]
+    assert not arr.flags.writeable
+    assert arr.ctypes.data % 64 == 0
+
+    # the loaded tree may be modified
+    loaded["a.c.new"] = {"x": 1}
+    loaded["h.arr"] = 1
+    assert loaded["a.c.new.x"] == 1
+    assert ("a", "c", "new", "x") in list(loaded.walkkeys())
+    assert loaded.deepcopy().object == loaded.object
+
+
+def test_binary_02_stream(mixed_tree):
+    tree = mixed_tree
+    stream = BytesIO()
+    write_tree(stream, tree)
+
+    root, meta = read_tree(stream.getvalue(), lazy=False)
+    assert type(root) is dict
+    assert meta == {"sep": "."}
+    _check_equal(NestedMKDict(root), tree)
+
+    with raises(ValueError):
+        read_tree(b"garbage" * 10)
+    with raises(ValueError):
+        read_tree(stream.getvalue()[:-3])
+
+
+def test_binary_03_lazydict():
+    root, _ = read_tree(_stream_bytes({"a": {"b": "x"}, "c": "y"}))
+    assert root == {"a": {"b": "x"}, "c": "y"}
+    copied = root.copy()
+    assert copied.pop("c") == "y"
+    assert "c" in root
+    assert dict(root) == {"a": {"b": "x"}, "c": "y"}
+    assert list(root.values())[1] == "y"
+
+    # the copies and the unions hold the decoded values
+    for other in (
+        read_tree(_stream_bytes({"a": {"b": "x"}}))[0].copy(),
+        read_tree(_stream_bytes({"a": {"b": "x"}}))[0] | {"c": "y"},
+        {"c": "y"} | read_tree(_stream_bytes({"a": {"b": "x"}}))[0],
+    ):
+        assert all(value.__class__.__name__ != "_Pending" for value in dict.values(other))
+        assert other["a"] == {"b": "x"}
+    values = read_tree(_stream_bytes({"a": 1, "b": "y"}))[0].values()
+    assert isinstance(values, ValuesView)
+    assert len(values) == 2 and "y" in values and list(values) == [1, "y"]
+    assert root.popitem() == ("c", "y")
+
+    import pickle
+
+    assert pickle.loads(pickle.dumps(root)) == {"a": {"b": "x"}}
+
+
+def _stream_bytes(dct):
+    stream = BytesIO()
+    write_tree(stream, dct)
+    return stream.getvalue()
+
+
+def test_binary_04_dump_load(mixed_tree):
+    tree = mixed_tree
+    stream = BytesIO()
+    tree.dump(stream)
+
+    for lazy in (True, False):
+        stream.seek(0)
+        loaded = NestedMKDict.load(stream, lazy=lazy)
+        assert loaded._sep == "."
+        assert isinstance(loaded.object, LazyDict) == lazy
+        if lazy:
+            assert dict.__getitem__(loaded.object, "h").__class__.__name__ == "_Pending"
+            assert isinstance(loaded.get_dict("h"), NestedMKDict)
+            assert isinstance(dict.__getitem__(loaded.object, "h"), LazyDict)
+        _check_equal(loaded, tree)
+
+        arr = loaded["h.arr"]
+        arr[0, 0] = 10
+        assert loaded["h.arr"][0, 0] == 10
+        loaded["a.c.new"] = {"x": 1}
+        assert loaded["a.c.new.x"] == 1
@@ -0,0 +1,102 @@
+import numpy as np
+from pytest import raises
+
+from multikeydict.columnarmkdict import ColumnarMKDict
+from multikeydict.nestedmkdict import NestedMKDict
+from multikeydict.tools import mkmap
+
+
+def test_columnarmkdict_01():
+    dct = {"a": {"b": 1.0, "c": {"d": 2.0, "e": 3.0}}, "f": 4.0}
+    cd = ColumnarMKDict(dct, sep=".")
+
+    assert len(cd) == 4
+    assert cd.values.dtype == np.float64
+    assert list(cd.walkkeys()) == list(NestedMKDict(dct).walkkeys())
+    assert list(cd.walkitems()) == list(NestedMKDict(dct).walkitems())
+    assert cd["a.c.d"] == 2.0
+    assert "a.c" in cd
+    assert "a.x" not in cd
+    assert cd.flatten() == {"a.b": 1.0, "a.c.d": 2.0, "a.c.e": 3.0, "f": 4.0}
+    assert cd.to_nested().object == dct
+    with raises(KeyError):
+        cd["a.x"]
+
+    # nested dictionary is a view
+    sub = cd["a.c"]
+    assert isinstance(sub, ColumnarMKDict)
+    assert list(sub.walkitems()) == [(("d",), 2.0), (("e",), 3.0)]
+    assert np.shares_memory(sub.walkvalues(), cd.walkvalues())
+    sub["d"] = 20.0
+    assert cd["a.c.d"] == 20.0
+    cd["a"] = 0.0
+    assert cd.walkvalues().tolist() == [0.0, 0.0, 0.0, 4.0]
+    with raises(KeyError):
+        cd["a.x"] = 1.0
+
+    with raises(TypeError):
+        ColumnarMKDict({"a": "text"})
+    with raises(TypeError):
+        ColumnarMKDict({"a": np.zeros(3), "b": np.zeros(3)})
+
+
+def test_columnarmkdict_02_arithmetic():
+    d1 = ColumnarMKDict({"a": {"b": 1, "c": 2}, "d": 3}, dtype="d")
+    d2 = ColumnarMKDict({"d": 30, "a": {"c": 20, "b": 10}}, dtype="d")
+
+    res = d1 * 2 + 1
+    assert isinstance(res, ColumnarMKDict)
+    assert res._keys is d1._keys
+    assert res.walkvalues().tolist() == [3.0, 5.0, 7.0]
+
+    # aligned by key
+    res = d1 + d2
+    assert list(res.walkitems()) == [(("a", "b"), 11.0), (("a", "c"), 22.0), (("d",), 33.0)]
+    res = 1 - d1
+    assert res.walkvalues().tolist() == [0.0, -1.0, -2.0]
+    assert np.exp(d1)["d"] == np.exp(3.0)
+    assert np.sum(d1) == 6.0
+    assert (d1 < 2).walkvalues().tolist() == [True, False, False]
+
+    d1 *= 2
+    assert d1.walkvalues().tolist() == [2.0, 4.0, 6.0]
+
+    with raises(ValueError):
+        d1 + ColumnarMKDict({"a": {"b": 1}})
+
+    # mkmap dispatches ufuncs to the arrays
+    res = mkmap(np.add, d1, d2, sep=".")
+    assert isinstance(res, ColumnarMKDict)
+    assert res["a.c"] == 24.0
+    res = mkmap(lambda a, b: a - b, d1, d2)
+    assert isinstance(res, NestedMKDict)
+    assert res.object == {"a": {"b": -8.0, "c": -16.0}, "d": -24.0}
+
+
+def test_columnarmkdict_03_leafindex_order():
+    tree = NestedMKDict({"a": {"b": 1}, "c": {"x": 5}}, sep=".", leaf_index=True)
+    tree["a.d"] = 3
+    tree["c.y"] = 6
+    tree["a.e.f"] = 4
+
+    cd = ColumnarMKDict(tree)
+    assert cd["a"].flatten() == {"b": 1, "d": 3, "e.f": 4}
+    assert cd["c"].flatten() == {"x": 5, "y": 6}
+    assert cd["a.e.f"] == 4
+    assert list(cd.walkkeys()) == list(tree.walkkeys())
+
+
+def test_columnarmkdict_04_lazy_import():
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    code = (
+        "import sys, multikeydict, multikeydict.tools\n"
+        "assert 'numpy' not in sys.modules\n"
+        "assert multikeydict.ColumnarMKDict.__name__ == 'ColumnarMKDict'\n"
+        "assert 'numpy' in sys.modules\n"
+    )
+    subprocess.run(
+        [sys.executable, "-c", code], check=True, cwd=Path(__file__).parent.parent
+    )
@@ -0,0 +1,63 @@
+import numpy as np
+
+from multikeydict.nestedmkdict import NestedMKDict
+from multikeydict.tools import apply_patch, diff
+
+
+def test_diff_01():
+    a = NestedMKDict(
+        {
+            "a": {"b": 1, "c": {"d": 2, "e": 3}},
+            "f": 4,
+            "g": {"h": 5},
+            "arr": np.arange(3),
+            "same": {"x": 1},
+        },
+        sep=".",
+    )
+    b = NestedMKDict(
+        {
+            "a": {"b": 1, "c": {"d": 20, "n": 6}},
+            "f": {"i": 7},
+            "g": 8,
+            "arr": np.arange(3),
+            "same": a.object["same"],
+            "new": {"j": {"k": 9}},
+        },
+        sep=".",
+    )
+
+    patch = diff(a, b)
+    assert patch.replaced == {("a", "c", "d"): (2, 20)}
+    assert patch.removed == {("a", "c", "e"): 3, ("f",): 4, ("g", "h"): 5}
+    assert patch.added == {
+        ("a", "c", "n"): 6,
+        ("f", "i"): 7,
+        ("g",): 8,
+        ("new", "j", "k"): 9,
+    }
+    assert len(patch) == 8
+
+    patched = apply_patch(a.deepcopy(), patch)
+    assert patched.flatten() == b.flatten() | {"arr": patched["arr"]}
+    assert not diff(patched, b)
+
+    reverted = apply_patch(patched, patch.inverted())
+    assert not diff(reverted, a)
+    assert reverted.flatten().keys() == a.flatten().keys()
+
+
+def test_diff_02_snapshot():
+    base = NestedMKDict.from_flatdict(
+        ((f"l{i}", f"m{j}", "x"), i * j) for i in range(100) for j in range(10)
+    )
+    other = base.snapshot()
+    other["l5", "m3", "x"] = -1
+    del other["l7", "m1"]
+
+    patch = diff(base, other)
+    assert patch.replaced == {("l5", "m3", "x"): (15, -1)}
+    assert patch.removed == {("l7", "m1", "x"): 7}
+    assert not patch.added
+    apply_patch(base, patch)
+    assert not diff(base, other)
@@ -75,3 +75,127 @@ def test_merge():
     assert fd['a', 'b', 'c2'] == 2
     fd['a', 'b', 'c4', 'd', 'e', 'f'] = 3
     fd['a', 'b', 'c4', 'd', 'e', 'g'] = 4
+
+
+def test_index():
+    from copy import copy
+    from random import Random
+
+    rng = Random(1)
+    parts = "abcdefg"
+    flatmkdict = FlatMKDict()
+    reference = {}
+    for _ in range(2000):
+        key = tuple(sorted(rng.sample(parts, rng.randint(1, 4))))
+        if key in reference and rng.random() < 0.3:
+            del flatmkdict[key[::-1]]
+            del reference[key]
+        else:
+            flatmkdict[key[::-1]] = reference[key] = rng.random()
+
+    copied = flatmkdict.copy()
+    for args in (("a",), ("b", "a"), ("c", "d", "e"), ("x",), ("a", "x")):
+        expected = [(k, v) for k, v in reference.items() if set(args).issubset(k)]
+        assert list(flatmkdict.items(*args)) == expected
+        assert list(copied.items(*args)) == expected
+        assert list(flatmkdict.slice(*args).items()) == expected
+
+    # The copies do not share the index
+    copied["a", "x"] = 1
+    del copied[next(iter(reference))]
+    assert list(flatmkdict.items("a", "x")) == []
+    assert list(copy(copied).items("a", "x")) == [(("a", "x"), 1)]
+    assert list(flatmkdict.items("a")) == [
+        (k, v) for k, v in reference.items() if "a" in k
+    ]
+    # The index is built by the first query and dropped by a new key
+    assert flatmkdict._index is not None
+    flatmkdict["a", "y"] = 2
+    assert flatmkdict._index is None
+    assert list(flatmkdict.items("y")) == [(("a", "y"), 2)]
+    flatmkdict.clear()
+    assert list(flatmkdict.items("a")) == []
+    assert not flatmkdict._index
+
+
+def test_keys():
+    flatmkdict = FlatMKDict()
+    flatmkdict["abc"] = 1
+    flatmkdict["b", "a"] = 2
+    flatmkdict[["c", "a"]] = 3
+    assert list(flatmkdict.keys()) == [("abc",), ("a", "b"), ("a", "c")]
+    assert "abc" in flatmkdict
+    assert ("a", "b", "c") not in flatmkdict
+    assert flatmkdict[{"a", "c"}] == 3
+    # the equal parts of different types are not mixed up
+    FlatMKDict()[1, 2] = 0
+    typed = FlatMKDict()
+    typed[True, 0] = 1
+    typed[2.0, 1] = 2
+    assert [type(k[1]) for k in typed.keys()] == [bool, float]
+
+    fsdict = FlatMKDict(frozenset_keys=True)
+    fsdict["abc"] = 1
+    fsdict["b", 1] = 2
+    fsdict["a", "x"] = FlatMKDict({("y",): 3})
+    assert fsdict[1, "b"] == 2
+    assert fsdict[frozenset(("b", 1))] == 2
+    assert fsdict["abc"] == 1
+    assert fsdict["x", "a", "y"] == 3
+    assert list(fsdict.keys()) == [
+        frozenset(("abc",)),
+        frozenset(("b", 1)),
+        frozenset(("a", "x", "y")),
+    ]
+    assert fsdict.slice("b") == {frozenset(("b", 1)): 2}
+    assert fsdict.copy() == fsdict
+    del fsdict[1, "b"]
+    assert list(fsdict.items(1)) == []
+
+
+def test_from_items_merge():
+    items = [(("b", "a"), 1), (("c",), 2), (("a", "b"), 3)]
+    flatmkdict = FlatMKDict.from_items(items)
+    assert list(flatmkdict.items()) == [(("a", "b"), 3), (("c",), 2)]
+    assert list(flatmkdict.items("a")) == [(("a", "b"), 3)]
+
+    canonical = FlatMKDict.from_items(
+        {("a", "b"): 1, ("c",): 2}, assume_canonical=True
+    )
+    assert canonical == {("a", "b"): 1, ("c",): 2}
+    assert list(canonical.items("a")) == [(("a", "b"), 1)]
+    nested = FlatMKDict.from_items(
+        iter([(("a",), 0), (("b",), FlatMKDict({"x": 1}))]), assume_canonical=True
+    )
+    assert list(nested.items()) == [(("a",), 0), (("b", "x"), 1)]
+
+    with raises(AttributeError):
+        FlatMKDict.from_items(items, protect=True)
+    protected = FlatMKDict.from_items(items[:2], protect=True)
+    with raises(AttributeError):
+        protected.update({("c",): 3})
+    with raises(AttributeError):
+        protected.merge({"b": 3}, "a")
+
+    sub = FlatMKDict({("y", "x"): 1, ("z",): 2})
+    merged = FlatMKDict.from_items(
+        [(("a",), 0), (("b",), sub), (("c",), 3)]
+    )
+    assert list(merged.items()) == [
+        (("a",), 0),
+        (("b", "x", "y"), 1),
+        (("b", "z"), 2),
+        (("c",), 3),
+    ]
+
+    merged.merge(sub, prefix="a")
+    merged.merge([(("w",), 4)])
+    assert merged["a", "x", "y"] == 1
+    assert merged["z", "a"] == 2
+    assert merged["w"] == 4
+    assert list(merged.keys("a")) == [("a",), ("a", "x", "y"), ("a", "z")]
+
+    # the constructor and update go through the bulk path
+    assert FlatMKDict(items, protect=False) == flatmkdict
+    flatmkdict.update(d=5)
+    assert flatmkdict["d"] == 5
@@ -0,0 +1,135 @@
+from random import Random
+
+from multikeydict.frozenmkdict import FrozenNestedMKDict
+from multikeydict.nestedmkdict import NestedMKDict
+from pytest import raises
+
+
+def test_frozenmkdict_01():
+    dct = {"a": {"b": {"c": 1, "d": 2}, "e": {"f": 3}}, "g": 4}
+    fd = FrozenNestedMKDict(dct, sep=".")
+
+    assert len(fd) == 2
+    assert fd["a.b.c"] == 1
+    assert fd[("a", "e", "f")] == 3
+    assert fd.get_value("g") == 4
+    assert fd.get("a.x", 5) == 5
+    assert "a.b.d" in fd
+    assert "a.b.x" not in fd
+    assert isinstance(fd("a.b"), FrozenNestedMKDict)
+    with raises(KeyError):
+        fd["a.x"]
+    with raises(TypeError):
+        fd.get_value("a")
+    with raises(TypeError):
+        fd["g.x"]
+
+    assert fd == dct
+    assert fd == NestedMKDict(dct)
+    assert fd.flatten() == {"a.b.c": 1, "a.b.d": 2, "a.e.f": 3, "g": 4}
+    assert list(fd.walkitems()) == list(NestedMKDict(dct).walkitems())
+    assert list(fd.walkitems(include_dicts=True, maxdepth=2)) == list(
+        NestedMKDict(dct).walkitems(include_dicts=True, maxdepth=2)
+    )
+    assert fd.unfreeze().object == dct
+
+
+def test_frozenmkdict_02_set_pop():
+    dct = {"a": {"b": {"c": 1, "d": 2}, "e": {"f": 3}}, "g": 4}
+    fd = FrozenNestedMKDict(dct, sep=".")
+
+    fd1 = fd.set("a.b.c", 10)
+    assert fd["a.b.c"] == 1
+    assert fd1["a.b.c"] == 10
+    # only the path to the modified leaf is copied
+    assert fd1("a.e") is fd("a.e")
+    assert fd1.set("a.b.c", 10) is fd1
+
+    fd2 = fd1.set("x.y", {"z": 5})
+    assert isinstance(fd2("x.y"), FrozenNestedMKDict)
+    assert fd2["x.y.z"] == 5
+    assert len(fd2) == 3
+    with raises(TypeError):
+        fd2.set("g.x", 1)
+
+    fd3 = fd2.pop("a.b.c").pop("x")
+    assert fd3 == {"a": {"b": {"d": 2}, "e": {"f": 3}}, "g": 4}
+    assert "x" in fd2
+    with raises(KeyError):
+        fd3.pop("x")
+    with raises(KeyError):
+        fd3.pop("x.y")
+
+
+def test_frozenmkdict_03_hash():
+    dct = {"a": {"b": 1, "c": 2}, "d": 3}
+    fd1 = FrozenNestedMKDict(dct)
+    fd2 = FrozenNestedMKDict({"d": 3, "a": {"c": 2, "b": 1}})
+    assert fd1 == fd2
+    assert hash(fd1) == hash(fd2)
+
+    cache = {fd1: "value"}
+    assert cache[fd2] == "value"
+    assert fd1.set("d", 4) not in cache
+    assert fd1.set("d", 4).set("d", 3) in cache
+
+    with raises(TypeError):
+        hash(FrozenNestedMKDict({"a": [1]}))
+
+
+def test_frozenmkdict_04_order():
+    keys = [f"k{i}" for i in range(100)][::-1]
+    fd = FrozenNestedMKDict({"x": dict.fromkeys(keys, 0)}, sep=".")
+    fd = fd.set("a.b", 1).set(("x", "k5"), 2).set(("x", "new"), 3)
+    assert list(fd) == ["x", "a"]
+    assert list(fd("x")) == keys + ["new"]
+    assert list(fd.walkkeys())[-2:] == [("x", "new"), ("a", "b")]
+    assert list(fd.flatten())[:2] == ["x.k99", "x.k98"]
+
+    popped = fd.pop(("x", "k50"))
+    assert list(popped("x")) == [k for k in keys if k != "k50"] + ["new"]
+    assert list(popped.set(("x", "k50"), 0)("x"))[-1] == "k50"
+    # the order does not affect the equality and the hash
+    assert popped.set(("x", "k50"), 0) == fd.set(("x", "k5"), 0).set(("x", "k5"), 2)
+    assert hash(FrozenNestedMKDict({"a": 1, "b": 2})) == hash(
+        FrozenNestedMKDict({"b": 2, "a": 1})
+    )
+
+
+class _CollidingKey:
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return self.value % 7
+
+    def __eq__(self, other):
+        return isinstance(other, _CollidingKey) and other.value == self.value
+
+    def __repr__(self):
+        return f"K{self.value}"
+
+
+def test_frozenmkdict_05_random():
+    rng = Random(1)
+    for keys in (list(range(2000)), [_CollidingKey(i) for i in range(100)]):
+        reference = {}
+        fd = FrozenNestedMKDict()
+        versions = []
+        for _ in range(3000):
+            key = rng.choice(keys)
+            if key in reference and rng.random() < 0.4:
+                del reference[key]
+                fd = fd.pop((key,))
+            else:
+                value = rng.random()
+                reference[key] = value
+                fd = fd.set((key,), value)
+            if rng.random() < 0.01:
+                versions.append((dict(reference), fd))
+            assert len(fd) == len(reference)
+
+        assert fd == reference
+        assert list(fd.items()) == list(reference.items())
+        for reference_old, fd_old in versions:
+            assert fd_old == reference_old
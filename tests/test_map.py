@@ -227,3 +227,127 @@ def test_reorder_function():
 
     with raises(ValueError):
         make_reorder_function([list("abc"), list("cad")])
+
+
+def _mkmap_sum(a, b):
+    if a == 7:
+        raise ValueError("seven")
+    return a + b
+
+
+def test_mkmap_02_parallel():
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+    m1 = NestedMKDict({f"k{i}": {f"l{j}": 10 * i + j for j in range(5)} for i in range(20)})
+    m2 = mkmap(lambda v: 2 * v, m1)
+    expected = mkmap(lambda a, b: a + b, m1, m2)
+
+    for kwargs in ({"workers": 4}, {"workers": 3, "chunksize": 7}, {"workers": 1, "chunksize": 1000}):
+        result = mkmap(lambda a, b: a + b, m1, m2, **kwargs)
+        assert list(result.walkitems()) == list(expected.walkitems())
+
+    with ThreadPoolExecutor(2) as executor:
+        result = mkmap(lambda a, b: a + b, m1, m2, executor=executor, chunksize=3)
+        assert list(result.walkitems()) == list(expected.walkitems())
+
+    m3 = NestedMKDict({"a": {"b": 1, "c": 7}, "d": 2})
+    with ProcessPoolExecutor(2) as executor:
+        result = mkmap(_mkmap_sum, m1, m2, executor=executor)
+        assert list(result.walkitems()) == list(expected.walkitems())
+
+        with raises(ValueError) as excinfo:
+            mkmap(_mkmap_sum, m3, m3, executor=executor, chunksize=1)
+        assert excinfo.value.mkmap_key == ("a", "c")
+        assert "('a', 'c')" in excinfo.value.__notes__[0]
+
+    for kwargs in ({}, {"workers": 2}):
+        with raises(ValueError) as excinfo:
+            mkmap(_mkmap_sum, m3, m3, **kwargs)
+        assert excinfo.value.mkmap_key == ("a", "c")
+
+    # the own key of the exception is kept
+    error = ValueError()
+    error.key = "own"
+
+    def fail(_):
+        raise error
+
+    with raises(ValueError) as excinfo:
+        mkmap(fail, m3)
+    assert excinfo.value.key == "own"
+    assert excinfo.value.mkmap_key == ("a", "b")
+
+    with raises(ValueError):
+        mkmap(_mkmap_sum, m3, m3, workers=2, chunksize=0)
+
+
+def test_mkmap_03_missing():
+    m1 = NestedMKDict({"a": {"b": 1, "c": 2}, "d": 3})
+    m2 = NestedMKDict({"a": {"b": 10}, "d": 30})
+
+    with raises(KeyError):
+        mkmap(lambda a, b: a + b, m1, m2)
+
+    result = mkmap(lambda a, b: a + b, m1, m2, missing="skip")
+    assert result.object == {"a": {"b": 11}, "d": 33}
+
+    result = mkmap(lambda a, b: a + b, m1, m2, missing="fill", fillvalue=0)
+    assert result.object == {"a": {"b": 11, "c": 2}, "d": 33}
+
+
+def test_remap_items_02_lazy(capsys):
+    from random import Random
+
+    from multikeydict.tools import iter_remap_items
+
+    rng = Random(1)
+    parts = ("a", "b", "c", "d")
+    source = NestedMKDict()
+    for c, key in enumerate(product(parts, parts, parts)):
+        source[key] = c
+
+    reorders = (
+        [2, 0, 1],
+        {"from": ["p", "q", "r"], "to": ["r", "p"]},
+        {"from": ["p", "q", "r"], "to": ["q", "q", "p"]},
+    )
+    for i in range(60):
+        rename_indices = {
+            part: tuple(rng.sample("abcdxyz", rng.randint(1, 3)))
+            for part in rng.sample(parts, 2)
+        }
+        skip_indices_target = [
+            tuple(rng.sample("abcdxyz", rng.randint(1, 2)))
+            for _ in range(rng.randint(0, 3))
+        ]
+        kwargs = dict(
+            rename_indices=rename_indices,
+            reorder_indices=reorders[i % 3],
+            skip_indices_source=(("a", "b"),),
+            skip_indices_target=skip_indices_target,
+            fcn=lambda v: -v,
+        )
+        expected = list(iter_remap_items(source, verbose=True, **kwargs))
+        assert list(iter_remap_items(source, **kwargs)) == expected
+
+        target = remap_items(source, **kwargs)
+        assert list(target.walkitems()) == list(
+            NestedMKDict.from_flatdict(expected).walkitems()
+        )
+
+    # the parts, dropped by the reorder, do not skip the target keys
+    kwargs = dict(
+        rename_indices={"x": ("a1", "a2")},
+        reorder_indices={"from": ["x", "b", "c"], "to": ["c", "x"]},
+        skip_indices_target=[("b",)],
+    )
+    source2 = NestedMKDict({"x": {"b": {"c": 1}}})
+    for verbose in (True, False):
+        assert remap_items(source2, verbose=verbose, **kwargs).object == {
+            "c": {"a1": 1, "a2": 1}
+        }
+    capsys.readouterr()
+
+    flat = remap_items(source, {}, rename_indices={"a": ("x", "y")})
+    assert flat[("x", "b", "c")] == source["a", "b", "c"]
+    assert len(flat) == (3 + 2) ** 3
@@ -71,3 +71,46 @@ def test_match():
 
     with raises(ValueError):
         match_keys((left_extra,), right_extra, print)
+
+
+def test_match_indexed():
+    from random import Random
+
+    rng = Random(1)
+    parts = "abcdef"
+
+    def randkey():
+        return tuple(rng.sample(parts, rng.randint(0, 3)))
+
+    def run(left_seq, right, fcn_skip, **kwargs):
+        calls = []
+        try:
+            match_keys(
+                left_seq,
+                right,
+                lambda *args: calls.append(args),
+                fcn_outer_before=lambda key: calls.append(("before", key)),
+                fcn_skip=fcn_skip,
+                **kwargs,
+            )
+        except ValueError as error:
+            calls.append(str(error).split(" {")[0])
+        return calls
+
+    for _ in range(200):
+        left_seq = tuple(
+            tuple(randkey() for _ in range(rng.randint(1, 5)))
+            for _ in range(rng.randint(1, 3))
+        )
+        right = [randkey() for _ in range(rng.randint(0, 6))]
+        for left_in_right, right_in_left in ((True, True), (True, False), (False, True)):
+            for require_all in (True, False):
+                kwargs = dict(
+                    left_in_right=left_in_right,
+                    right_in_left=right_in_left,
+                    require_all_left_keys_processed=require_all,
+                    require_all_right_keys_processed=require_all,
+                    skippable_left_keys_should_contain=None if require_all else ("a",),
+                )
+                expected = run(left_seq, right, lambda *_: None, **kwargs)
+                assert run(left_seq, right, None, **kwargs) == expected
@@ -1,6 +1,6 @@
 import pytest
 from multikeydict.nestedmkdict import NestedMKDict
-from multikeydict.nestedmkdict import walkitems, walkkeys, walkvalues
+from multikeydict.nestedmkdict import walkitems, walkkeys, walkvalues, zipwalkitems
 from pytest import raises
 
 
@@ -370,6 +370,26 @@ def test_nestedmkdict_09_dictcopy():
     assert i == 2
 
 
+def test_nestedmkdict_09_deepcopy_arrays():
+    from numpy import arange
+
+    dct = {"a": {"b": arange(3), "c": [1]}, "d": NestedMKDict({"e": arange(2)})}
+    dw = NestedMKDict(dct, sep=".")
+
+    dw1 = dw.deepcopy()
+    assert type(dw1.object["d"]) is dict
+    assert dw1.object["d"]["e"] is dw["d.e"]
+    assert dw1["a.b"] is dw["a.b"]
+    assert dw1["a.c"] is dw["a.c"]
+
+    dw2 = dw.deepcopy(copy_arrays=True)
+    assert dw2["a.b"] is not dw["a.b"]
+    assert (dw2["a.b"] == dw["a.b"]).all()
+    dw2["a.b"][0] = 10
+    assert dw["a.b"][0] == 0
+    assert dw2["a.c"] is dw["a.c"]
+
+
 def test_nestedmkdict_09_walkitems():
     dct = {
         "a": 1,
@@ -443,6 +463,24 @@ def test_nestedmkdict_09_walk():
     ]
 
 
+def test_nestedmkdict_09_walkitems_deep():
+    depth = 5000
+    dw = NestedMKDict({})
+    dw[("k",) * depth] = 1
+    dw[("k",) * 3 + ("l",)] = 2
+
+    items = list(dw.walkitems())
+    assert items == [(("k",) * depth, 1), (("k",) * 3 + ("l",), 2)]
+
+    dicts = list(dw.walkitems(include_dicts=True, maxdepth=3))
+    keys = [("k",), ("k", "k"), ("k", "k", "k"), ("k", "k", "k")]
+    assert [k for k, _ in dicts] == keys
+    for k, v in dicts:
+        assert v.object is dw.get_any(k, unwrap=True)
+        assert v.parent.object is dw.get_dict(k[:-1]).object
+        assert v.get_parent(len(k)) is dw
+
+
 def test_nestedmkdict_10_iterkey():
     d = dict(a=1, b=2, c=3)
     dw = NestedMKDict(d)
@@ -465,6 +503,180 @@ def test_nestedmkdict_11_iterkey():
     assert [1.0] == list(dw.iterkey(1.0))
 
 
+def test_nestedmkdict_12_keypath():
+    from multikeydict.nestedmkdict import _keypath_cached
+
+    dw = NestedMKDict({}, sep=".")
+    dwn = NestedMKDict({})
+
+    assert dw.keypath("a") == ("a",)
+    assert dw.keypath("a.b") == ("a", "b")
+    assert dwn.keypath("a.b") == ("a.b",)
+    assert dw.keypath(("a.b", "c")) == ("a", "b", "c")
+    assert dwn.keypath(("a.b", "c")) == ("a.b", "c")
+    assert dw.keypath(["a", ("b.c",)]) == ("a", "b", "c")
+    assert dw.keypath(1) == (1,)
+    assert dw.splitkey("a.b.c") == ("a", ("b", "c"))
+
+    hits = _keypath_cached.cache_info().hits
+    dw["x.y.z"] = 1
+    assert dw["x.y.z"] == 1
+    assert _keypath_cached.cache_info().hits > hits
+
+    with raises(KeyError) as excinfo:
+        dw.get_value("x.y.w")
+    assert excinfo.value.rest == ("w",)
+
+    # the equal key parts of different types are not mixed up by the cache
+    typed = NestedMKDict({}, sep=".")
+    typed["x", 1] = 1
+    typed["x", True] = 2
+    typed["a", 1.0] = 3
+    assert typed.keypath(("x", True)) == ("x", True)
+    assert [type(key[1]) for key in typed.walkkeys()] == [int, float]
+    assert typed["x", 1] == 2
+    assert type(next(iter(typed["a"].keys()))) is float
+    other = NestedMKDict({}, sep=".")
+    other["x", True] = 4
+    assert list(other.walkkeys()) == [("x", True)]
+    assert type(next(other.walkkeys())[1]) is bool
+
+
+def test_nestedmkdict_13_descent():
+    dct = {"a": {"b": {"c": {"d": 1}}}, "e": 2}
+    dw = NestedMKDict(dct, sep=".")
+
+    c = dw["a.b.c"]
+    assert c.object is dct["a"]["b"]["c"]
+    assert c.parent.object is dct["a"]["b"]
+    assert c.get_parent(3) is dw
+    assert dw.get_dict("a.b").parent.parent is dw
+    assert dw.setdefault("a.b.x", {}).parent.object is dct["a"]["b"]
+
+    with raises(KeyError) as excinfo:
+        dw.get_value("a.b.w.y")
+    assert excinfo.value.rest == ("w", "y")
+    with raises(TypeError):
+        dw["e.f"]
+    with raises(TypeError):
+        dw.get_value("a.b")
+    with raises(TypeError):
+        dw["e.f"] = 3
+    with raises(TypeError):
+        "e.f" in dw
+    assert "a.b.y" not in dw
+
+    dw["a.b.y.z"] = 3
+    assert dct["a"]["b"]["y"] == {"z": 3}
+
+
+def test_nestedmkdict_14_get_set_many():
+    items = [
+        (("a", "b", "c"), 1),
+        (("a", "b", "d"), 2),
+        ("a.e", 3),
+        (("a", "b"), 4),
+        (("f",), 5),
+        (("a", "g", "c"), 6),
+    ]
+    dw = NestedMKDict({}, sep=".")
+    dwcheck = NestedMKDict({}, sep=".")
+    assert dw.set_many(items) is dw
+    for key, value in items:
+        dwcheck[key] = value
+    assert dw == dwcheck
+    assert list(dw.walkitems()) == list(dwcheck.walkitems())
+
+    with raises(TypeError):
+        dw.set_many({"a.b.c.d": 1, ("f", "g"): 2})
+
+    assert dw.get_many(["a.g.c", "a.e", "a.b", "f", ()]) == [6, 3, 4, 5, dw]
+    (ag,) = dw.get_many(["a.g"])
+    assert ag.object is dw.object["a"]["g"]
+    assert ag.parent.parent is dw
+    assert dw.get_many(["a.g"], unwrap=True)[0] is dw.object["a"]["g"]
+    with raises(KeyError):
+        dw.get_many(["a.g.c", "a.g.x"])
+    with raises(TypeError):
+        dw.get_many(["a.g.c", "a.g.c.x"])
+
+
+def test_nestedmkdict_15_path():
+    dct = {"a": {"b": {"c": {"d": 1}}}, "e": {"f": 2}}
+    dw = NestedMKDict(dct, sep=".")
+
+    assert dw.parent_key is None
+    assert dw.path == ()
+    assert dw["a.b.c"].path == ("a", "b", "c")
+    assert dw("a.b").parent_key == "b"
+    assert dw.create_child("g.h").path == ("g", "h")
+    assert dw._("i.j")._.path == ("i", "j")
+    assert dw.setdefault("k.l", {}).path == ("k", "l")
+    assert [(k, v.path) for k, v in dw("a").items()] == [("b", ("a", "b"))]
+    assert [v.path for v in dw.values()][1] == ("e",)
+    dicts = dw.walkitems(include_dicts=True)
+    assert [v.path for _, v in dicts if isinstance(v, NestedMKDict)][:3] == [
+        ("a",),
+        ("a", "b"),
+        ("a", "b", "c"),
+    ]
+
+    # The dictionary is moved: the key is looked up
+    c = dw["a.b.c"]
+    dct["a"]["b"]["m"] = dct["a"]["b"].pop("c")
+    assert c.parent_key == "m"
+    del dct["a"]["b"]["m"]
+    with raises(RuntimeError):
+        c.parent_key
+
+
+def test_nestedmkdict_16_zipwalkitems():
+    d1 = NestedMKDict({"a": {"b": 1, "c": {"d": 2, "e": 3}}, "f": 4, "g": {}})
+    d2 = NestedMKDict({"f": 40, "a": {"c": {"e": 30, "d": 20}, "b": 10}})
+    d3 = NestedMKDict({"a": {"b": 100, "c": {"d": {"x": 1}}}, "f": 400})
+    d4 = NestedMKDict({"a": {"b": 1000}})
+
+    assert list(zipwalkitems(d1, d2)) == [
+        (("a", "b"), (1, 10)),
+        (("a", "c", "d"), (2, 20)),
+        (("a", "c", "e"), (3, 30)),
+        (("f",), (4, 40)),
+    ]
+    assert list(zipwalkitems(d1)) == [(k, (v,)) for k, v in d1.walkitems()]
+
+    # nested dictionary in place of a leaf is passed as NestedMKDict
+    with raises(KeyError):
+        list(zipwalkitems(d1, d3))
+    items = list(zipwalkitems(d1, d3, missing="skip"))
+    assert [key for key, _ in items] == [("a", "b"), ("a", "c", "d"), ("f",)]
+    assert items[1][1][1] == {"x": 1}
+
+    assert list(zipwalkitems(d1, d2, d4, missing="fill", fillvalue=-1)) == [
+        (("a", "b"), (1, 10, 1000)),
+        (("a", "c", "d"), (2, 20, -1)),
+        (("a", "c", "e"), (3, 30, -1)),
+        (("f",), (4, 40, -1)),
+    ]
+    assert list(zipwalkitems(d1, d4, missing="skip")) == [(("a", "b"), (1, 1000))]
+
+    # leaf in place of a nested dictionary
+    d5 = NestedMKDict({"a": 1, "f": 2})
+    with raises(TypeError):
+        list(zipwalkitems(d1, d5, missing="skip"))
+
+    # stored NestedMKDict
+    d6 = NestedMKDict({"a": NestedMKDict({"b": 5, "c": {"d": 6, "e": 7}}), "f": 8})
+    assert list(zipwalkitems(d6, d1)) == [
+        (("a", "b"), (5, 1)),
+        (("a", "c", "d"), (6, 2)),
+        (("a", "c", "e"), (7, 3)),
+        (("f",), (8, 4)),
+    ]
+
+    with raises(ValueError):
+        list(zipwalkitems(d1, d2, missing="ignore"))
+
+
 def test_nestedmkdict_setdefault_01():
     d = dict(a=dict(b=dict(key="value")))
     dw = NestedMKDict(d)
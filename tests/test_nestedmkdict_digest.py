@@ -0,0 +1,90 @@
+import numpy as np
+
+from multikeydict.nestedmkdict import NestedMKDict
+from multikeydict.tools import diff
+
+
+def test_digest_01(mixed_tree):
+    tree = mixed_tree
+    digest = tree.digest()
+    assert isinstance(digest, bytes) and len(digest) == 32
+    assert tree.digest() == digest
+    assert tree.deepcopy().digest() == digest
+
+    # order independent, type and content sensitive
+    reordered = NestedMKDict({key: tree.object[key] for key in reversed(tree.object)})
+    assert reordered.digest() == digest
+    assert NestedMKDict({"b": 1}).digest() != NestedMKDict({"b": 1.0}).digest()
+    assert NestedMKDict({"b": "1"}).digest() != NestedMKDict({"b": b"1"}).digest()
+    assert NestedMKDict({"x": np.arange(3)}).digest() != NestedMKDict(
+        {"x": np.arange(3.0)}
+    ).digest()
+    assert NestedMKDict({"x": np.arange(6).reshape(2, 3)}).digest() != NestedMKDict(
+        {"x": np.arange(6).reshape(3, 2)}
+    ).digest()
+
+    assert tree.digest("a") == tree("a").digest()
+    assert tree.digest("a.b") == NestedMKDict({"x": 1}).digest("x")
+
+
+def test_digest_02_invalidation(mixed_tree):
+    tree = mixed_tree
+    digest = tree.digest()
+    digest_a = tree.digest("a")
+    digest_h = tree.digest("h")
+    node = tree._state.digests
+
+    tree["a.c.d"] = 3.5
+    assert node.digest is None
+    assert node.children["h"].digest == digest_h
+    assert node.children["a"].children["c"].digest is None
+    assert tree.digest("a") != digest_a
+    assert tree.digest() != digest
+
+    tree["a.c.d"] = 2.5
+    assert tree.digest() == digest
+
+    sub = tree("a.c")
+    sub["new"] = 1
+    assert tree.digest() != digest
+    del sub["new"]
+    assert tree.digest() == digest
+
+    assert tree.pop("f") is None
+    assert tree.digest() != digest
+    tree.setdefault("f", None)
+    assert tree.digest() == digest
+
+    tree.update({"a": {"b": 2}})
+    assert tree.digest("a") != digest_a
+    assert tree.digest("h") == digest_h
+
+
+def test_digest_03_snapshot_diff(mixed_tree):
+    tree = mixed_tree
+    other = tree.deepcopy()
+    snapshot = tree.snapshot()
+    tree.digest()
+    snapshot.digest()
+
+    snapshot["a.b"] = 10
+    assert tree.digest() == other.digest()
+    assert snapshot.digest() != tree.digest()
+    assert not diff(tree, other)
+
+    # diff() does not trust the cached digests: a stored dictionary, modified
+    # directly, keeps the stale digest, but its leaves are still compared
+    tree.object["a"]["b"] = 5
+    assert tree.digest() == other.digest()
+    assert diff(tree, other).replaced == {("a", "b"): (5, 1)}
+
+
+def test_digest_04_copy():
+    # copy() stays shallow for a tree with the cached digests
+    tree = NestedMKDict({"a": {"b": 1}}, sep=".")
+    tree.digest()
+    tree.subscribe(lambda changes: None)
+    copied = tree.copy()
+    copied["a.b"] = 9
+    assert tree["a.b"] == 9
+    assert tree._state.owned is None
@@ -0,0 +1,130 @@
+from random import Random
+
+from multikeydict.nestedmkdict import NestedMKDict
+from pytest import raises
+
+
+def check_index(dw):
+    assert dw._state.leafindex == dict(NestedMKDict(dw.object).walkitems())
+
+
+def test_nestedmkdict_leafindex_01():
+    dct = {"a": 1, "b": {"c": 2, "d": {"e": 3}}, "f": {}}
+    dw = NestedMKDict(dct, sep=".", leaf_index=True)
+    check_index(dw)
+
+    assert dw["b.d.e"] == 3
+    assert dw.get_value(("b", "c")) == 2
+    assert dw.get("b.x", 4) == 4
+    assert "b.d.e" in dw
+    assert "b.d" in dw
+    assert "b.x" not in dw
+    assert isinstance(dw["b.d"], NestedMKDict)
+
+    dw["b.d.g"] = 5
+    dw["b.c"] = {"h": 6, "i": {"j": 7}}
+    dw["a"] = 8
+    dw.setdefault("k.l", 9)
+    dw.setdefault("k.l", 10)
+    check_index(dw)
+
+    dw("b").set("c.i.m", 11)
+    dw._.b.d.e = 12
+    del dw._.b.d.g
+    assert dw.pop("b.c.i") == {"j": 7, "m": 11}
+    check_index(dw)
+
+    dw.delete_with_parents("k.l")
+    del dw["b.d"]
+    dw.update({"n": {"o": 13}, "a": 14})
+    check_index(dw)
+    assert list(dw.walkitems()) == [(("a",), 14), (("b", "c", "h"), 6), (("n", "o"), 13)]
+
+    with raises(TypeError):
+        dw["a.b"] = 1
+    with raises(KeyError):
+        dw.get_value("b.x")
+    check_index(dw)
+
+    dw2 = dw.deepcopy()
+    dw2["a"] = 15
+    check_index(dw)
+    check_index(dw2)
+    assert dw["a"] == 14
+
+    with raises(ValueError):
+        NestedMKDict({}, leaf_index=True, recursive_to_others=True)
+
+
+def test_nestedmkdict_leafindex_02():
+    rng = Random(1)
+    dw = NestedMKDict({}, leaf_index=True)
+    parts = "abc"
+    for _ in range(2000):
+        key = tuple(rng.choice(parts) for _ in range(rng.randint(1, 4)))
+        action = rng.random()
+        try:
+            if action < 0.5:
+                dw[key] = rng.random()
+            elif action < 0.6:
+                dw[key] = {"x": {"y": 1}}
+            elif action < 0.8:
+                dw.pop(key, delete_parents=rng.random() < 0.5)
+            else:
+                del dw[key]
+        except (KeyError, TypeError):
+            pass
+    check_index(dw)
+
+
+def test_nestedmkdict_leafindex_03_copy_wrap_order():
+    dw = NestedMKDict({"a": {"b": 1}, "c": {"x": 5}}, sep=".", leaf_index=True)
+    dw["a.z"] = 2
+    # tree order, not insertion order
+    assert list(dw.walkkeys()) == [("a", "b"), ("a", "z"), ("c", "x")]
+    assert list(dw.flatten()) == ["a.b", "a.z", "c.x"]
+
+    with raises(ValueError):
+        dw.copy()
+    copy = dw.snapshot()
+    copy["c.x"] = 100
+    check_index(dw)
+    check_index(copy)
+    assert dw["c.x"] == 5
+    assert copy["c.x"] == 100
+
+    wrapped = NestedMKDict(dw)
+    wrapped["c.x"] = 101
+    wrapped["c.y"] = 102
+    assert dw["c.x"] == 101
+    assert list(dw.walkitems())[-1] == (("c", "y"), 102)
+    check_index(dw)
+
+    sub = NestedMKDict(dw("c"))
+    sub["w"] = 103
+    assert dw["c.w"] == 103
+    check_index(dw)
+
+
+def test_nestedmkdict_leafindex_04_stored():
+    inner = NestedMKDict({"p": 1}, sep=".")
+    dw = NestedMKDict({"s": inner, "a": {"b": 2}}, sep=".", leaf_index=True)
+    assert dw._state.leafindex == {("a", "b"): 2}
+    assert dw["s.p"] == 1
+
+    # the stored NestedMKDict is modified via its own methods
+    inner["q"] = 4
+    inner["p"] = 3
+    assert dw["s.q"] == 4
+    assert dw.get_any("s.p") == 3
+    assert dw.get("s.q") == 4
+    assert dw.get_value("s.q") == 4
+    assert "s.q" in dw
+
+    dw["s.r"] = 5
+    assert inner["r"] == 5
+    dw["a.b"] = inner
+    assert dw["a.b.q"] == 4
+    assert dw._state.leafindex == {}
+    dw["a.b"] = 6
+    assert dw._state.leafindex == {("a", "b"): 6}
@@ -0,0 +1,86 @@
+from pytest import raises
+
+from multikeydict.nestedmkdict import MISSING, NestedMKDict
+
+
+def test_observers_01():
+    tree = NestedMKDict({"a": {"b": 1, "c": {"d": 2}}, "e": 3}, sep=".")
+    all_changes = []
+    a_changes = []
+    handle = tree.subscribe(all_changes.append)
+    tree("a").subscribe(a_changes.append, "c")
+
+    tree["a.c.d"] = 4
+    tree["e"] = 5
+    assert all_changes == [[(("a", "c", "d"), 2, 4)], [(("e",), 3, 5)]]
+    assert a_changes == [[(("a", "c", "d"), 2, 4)]]
+
+    all_changes.clear()
+    a_changes.clear()
+    tree.setdefault("a.c.x", 6)
+    tree.setdefault("a.c.x", 7)
+    assert tree.pop("a.c.x") == 6
+    del tree["a.b"]
+    assert all_changes == [
+        [(("a", "c", "x"), MISSING, 6)],
+        [(("a", "c", "x"), 6, MISSING)],
+        [(("a", "b"), 1, MISSING)],
+    ]
+    assert len(a_changes) == 2
+
+    # replacement of the containing dictionary
+    a_changes.clear()
+    tree["a"] = 0
+    assert a_changes == [[(("a",), {"c": {"d": 4}}, 0)]]
+
+    tree.unsubscribe(handle)
+    tree["e"] = 8
+    assert len(all_changes) == 4
+    with raises(ValueError):
+        tree.unsubscribe(handle)
+
+
+def test_observers_02_batch():
+    tree = NestedMKDict({"a": {"b": 1}}, sep=".", leaf_index=True)
+    calls = []
+    tree.subscribe(calls.append, ("a",))
+
+    tree.update({"a": {"b": 2, "c": 3}, "x": 1})
+    assert calls == [[(("a", "b"), 1, 2), (("a", "c"), MISSING, 3)]]
+    assert dict(tree.walkitems()) == {("a", "b"): 2, ("a", "c"): 3, ("x",): 1}
+
+    calls.clear()
+    tree.set_many({"a.d": 4, "a.e": 5})
+    with tree.batch():
+        tree["a.b"] = 6
+        tree["a.c"] = 7
+        assert not calls[1:]
+    assert calls == [
+        [(("a", "d"), MISSING, 4), (("a", "e"), MISSING, 5)],
+        [(("a", "b"), 2, 6), (("a", "c"), 3, 7)],
+    ]
+
+    # the snapshot has no observers
+    calls.clear()
+    snapshot = tree.snapshot()
+    snapshot["a.b"] = 0
+    assert not calls
+    tree["a.b"] = 0
+    assert calls == [[(("a", "b"), 6, 0)]]
+
+
+def test_observers_03_raising():
+    tree = NestedMKDict({"a": 1}, sep=".", leaf_index=True)
+    tree.digest()
+
+    def fail(changes):
+        raise RuntimeError("observer")
+
+    tree.subscribe(fail)
+    with raises(RuntimeError):
+        tree["a"] = 2
+    with raises(RuntimeError):
+        tree["b"] = 3
+    assert tree["a"] == 2
+    assert dict(tree.walkitems()) == {("a",): 2, ("b",): 3}
+    assert tree.digest() == NestedMKDict({"a": 2, "b": 3}).digest()
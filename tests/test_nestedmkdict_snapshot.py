@@ -0,0 +1,102 @@
+from random import Random
+
+from multikeydict.nestedmkdict import NestedMKDict
+from pytest import raises
+
+
+def test_nestedmkdict_snapshot_01():
+    dct = {"a": {"b": {"c": 1, "d": 2}, "e": {"f": 3}}, "g": 4}
+    dw = NestedMKDict(dct, sep=".")
+    b = dw("a.b")
+
+    snap = dw.snapshot()
+    assert snap == dw
+    # the snapshot copies the root dictionary only
+    assert snap.object is not dw.object
+    assert snap.object["a"] is dct["a"]
+    dct_a = dct["a"]
+
+    dw["a.b.c"] = 10
+    assert dct_a["b"]["c"] == 1
+    assert snap["a.b.c"] == 1
+    assert dw["a.b.c"] == 10
+    # only the path to the modified leaf is copied
+    assert dw.object is dct
+    assert dw.object["a"] is not dct_a
+    assert dw.object["a"]["e"] is dct_a["e"]
+    assert snap.object["a"]["e"] is dct_a["e"]
+
+    # the copied dictionaries are modified in place
+    a = dw.get_dict("a", unwrap=True)
+    dw["a.b.d"] = 20
+    assert dw.get_dict("a", unwrap=True) is a
+
+    # the modification of the snapshot
+    snap["a.e.f"] = 30
+    del snap["g"]
+    assert dw["a.e.f"] == 3
+    assert dw["g"] == 4
+    assert snap.pop("a.b.d") == 2
+    assert dw["a.b.d"] == 20
+
+    # the child, obtained before the snapshot, writes to its own tree
+    b["h"] = 5
+    assert dw["a.b.h"] == 5
+    assert "a.b.h" not in snap
+    assert b.object is dw.get_dict("a.b", unwrap=True)
+
+    with raises(TypeError):
+        dw["g.x"] = 1
+
+
+def test_nestedmkdict_snapshot_02():
+    rng = Random(2)
+    parts = "abc"
+
+    dw = NestedMKDict({}, leaf_index=True)
+    snapshots = []
+    for step in range(1000):
+        if step % 100 == 0:
+            snapshots.append((dw.snapshot(), dw.deepcopy()))
+        key = tuple(rng.choice(parts) for _ in range(rng.randint(1, 4)))
+        try:
+            if rng.random() < 0.7:
+                dw[key] = step
+            else:
+                dw.pop(key, delete_parents=True)
+        except (KeyError, TypeError):
+            pass
+
+    for snapshot, copy in snapshots:
+        assert snapshot == copy
+        assert snapshot._state.leafindex == copy._state.leafindex
+
+
+def test_nestedmkdict_snapshot_03_copy_wrap():
+    dw = NestedMKDict({"a": {"b": 1, "c": {"d": 2}}}, sep=".")
+    snap = dw.snapshot()
+
+    with raises(ValueError):
+        dw.copy()
+
+    wrapped = NestedMKDict(dw)
+    wrapped["a.b"] = 7
+    wrapped["a.c.d"] = 8
+    assert snap["a.b"] == 1
+    assert snap["a.c.d"] == 2
+    assert dw["a.b"] == 7
+    assert dw["a.c.d"] == 8
+
+    sub = NestedMKDict(dw("a.c"))
+    sub["e"] = 9
+    assert dw["a.c.e"] == 9
+    assert "a.c.e" not in snap
+
+    # the same from the snapshot side
+    NestedMKDict(snap)["a.b"] = 10
+    NestedMKDict(snap)["a.c.d"] = 11
+    with raises(ValueError):
+        snap.copy()
+    assert snap["a.b"] == 10
+    assert dw["a.b"] == 7
+    assert dw["a.c.d"] == 8
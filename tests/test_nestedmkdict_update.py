@@ -84,3 +84,82 @@ def test_nestedmkdict_update_01():
     dw1 = dw1a.deepcopy()
     with raises(TypeError):
         dw1^=dw4
+
+
+def test_nestedmkdict_update_02_changeset():
+    base = NestedMKDict({"a": {"b": 1, "c": {"d": 2}}, "e": 3, "f": {"g": 4}}, sep=".")
+    other = {"a": {"b": 1, "c": {"d": 5, "x": 6}}, "f": 7, "h": {"i": {}, "j": 8}, "k": {}}
+
+    changes = base.merge(other)
+    assert changes.added == [("a", "c", "x"), ("h", "j")]
+    assert changes.replaced == [("a", "c", "d"), ("f",)]
+    assert changes.unchanged == [("a", "b")]
+    assert changes
+    assert base.object == {
+        "a": {"b": 1, "c": {"d": 5, "x": 6}},
+        "e": 3,
+        "f": 7,
+        "h": {"j": 8},
+    }
+    assert not base.merge(other)
+
+    sub = base("a")
+    changes = sub.merge({"c": {"y": 1}})
+    assert changes.added == [("c", "y")]
+    assert base["a.c.y"] == 1
+
+    with raises(TypeError):
+        base.merge({"e": {"x": 1}})
+    with raises(TypeError):
+        base.update_missing({"a": {"b": 2}})
+    base.update_missing({"a": {"z": 2}})
+    assert base["a.z"] == 2
+
+    # the keys of other are split by sep and flattened as for set()
+    tree = NestedMKDict({"x": {"y": 1}}, sep=".")
+    changes = tree.merge({"a.b": 1, "c": {"d.e": 2}, ("f", "g"): 3, "x": {"y": 1}})
+    assert changes.added == [("a", "b"), ("c", "d", "e"), ("f", "g")]
+    assert changes.unchanged == [("x", "y")]
+    assert tree.object == {"x": {"y": 1}, "a": {"b": 1}, "c": {"d": {"e": 2}}, "f": {"g": 3}}
+    tree.update_missing({"x.z": 2})
+    assert tree.object["x"] == {"y": 1, "z": 2}
+    with raises(TypeError):
+        tree.update_missing({"x.y": 2})
+    tree |= {"c.d": {"h.i": 4}}
+    assert tree.object["c"] == {"d": {"e": 2, "h": {"i": 4}}}
+    assert NestedMKDict({}, sep=".").update({"a.b": 1, "c": {"d.e": 2}}).object == {
+        "a": {"b": 1},
+        "c": {"d": {"e": 2}},
+    }
+
+
+def test_nestedmkdict_update_03_leafindex_snapshot():
+    base = NestedMKDict({"a": {"b": 1, "c": {"d": 2}}, "e": 3}, leaf_index=True)
+    snap = base.snapshot()
+    other = NestedMKDict({"a": {"c": {"d": 4, "n": {"m": 5}}}, "e": 6, "g": {"h": 7}})
+
+    base.update(other)
+    assert snap.object == {"a": {"b": 1, "c": {"d": 2}}, "e": 3}
+    assert base.object == {"a": {"b": 1, "c": {"d": 4, "n": {"m": 5}}}, "e": 6, "g": {"h": 7}}
+    assert dict(base.walkitems()) == dict(_walk(base.object))
+    assert base.object["a"] is not snap.object["a"]
+
+    changes = base.merge({"a": {"c": 9}})
+    assert changes.replaced == [("a", "c")]
+    assert dict(base.walkitems()) == dict(_walk(base.object))
+    assert snap["a", "c", "d"] == 2
+
+    # stored NestedMKDict handles the rest of the key
+    inner = NestedMKDict({"x": 1})
+    tree = NestedMKDict({"s": inner})
+    changes = tree.merge({"s": {"y": 2}})
+    assert changes.added == [("s", "y")]
+    assert inner.object == {"x": 1, "y": 2}
+
+
+def _walk(dct, prefix=()):
+    for k, v in dct.items():
+        if isinstance(v, dict):
+            yield from _walk(v, prefix + (k,))
+        else:
+            yield prefix + (k,), v
@@ -0,0 +1,81 @@
+from io import BytesIO, StringIO
+
+import numpy as np
+from pytest import raises
+
+from multikeydict.nestedmkdict import NestedMKDict
+from multikeydict.tools import (
+    dump_csv,
+    dump_jsonl,
+    dump_records,
+    load_csv,
+    load_jsonl,
+    load_records,
+)
+
+
+def test_stream_01_text():
+    tree = NestedMKDict(
+        {
+            "a": {"b": 1, "c": {"d": 2.5, "e": "text"}},
+            "f": None,
+            "g": [1, 2, {"x": 3}],
+            "h": {"t": True, "u": False, "big": 2**70},
+        },
+        sep=".",
+    )
+    for dump, load in ((dump_jsonl, load_jsonl), (dump_csv, load_csv)):
+        buffer = StringIO(newline="")
+        assert dump(tree, buffer) == 8
+        buffer.seek(0)
+        loaded = load(buffer)
+        assert list(loaded.walkitems()) == list(tree.walkitems())
+
+        buffer = StringIO(newline="")
+        dump(tree, buffer, sep="/")
+        assert "a/c/d" in buffer.getvalue()
+        buffer.seek(0)
+        target = NestedMKDict({"z": 0}, sep=".")
+        assert load(buffer, sep="/", target=target) is target
+        assert target["a.c.e"] == "text"
+        assert target["z"] == 0
+
+    buffer = StringIO("key,value\na.b,plain text\na.c,3\n")
+    loaded = load_csv(buffer)
+    assert loaded.flatten() == {"a.b": "plain text", "a.c": 3}
+
+
+def test_stream_02_records():
+    tree = NestedMKDict(
+        {
+            "a": {"b": 1, "c": {"d": 2.5, "e": "text"}},
+            "f": None,
+            "h": {"t": True, "big": 2**70},
+            "arr": {"x": np.arange(12, dtype="f4").reshape(3, 4), "s": np.array(1.0)},
+            "bytes": b"\x00\x01",
+            "set": {1, 2},
+        },
+        sep=".",
+    )
+
+    buffer = BytesIO()
+    assert dump_records(tree, buffer) == 10
+    buffer.seek(0)
+    loaded = load_records(buffer)
+    assert list(loaded.walkkeys()) == list(tree.walkkeys())
+    for (_, value), (_, expected) in zip(loaded.walkitems(), tree.walkitems()):
+        if isinstance(expected, np.ndarray):
+            assert value.dtype == expected.dtype
+            assert (value == expected).all()
+        else:
+            assert value == expected
+    arr = loaded["arr.x"]
+    arr[0, 0] = 10
+    assert arr[0, 0] == 10
+
+    with raises(ValueError):
+        load_records(BytesIO(b"garbage!"))
+
+    data = buffer.getvalue()
+    with raises(ValueError):
+        load_records(BytesIO(data[:-3]))